@@ -3,20 +3,23 @@ from tkinter import Tk, Label, Entry, Button, Text, messagebox, ttk, Toplevel
 from tkcalendar import DateEntry
 from datetime import datetime, timedelta
 import sqlite3
-
-# Constants
-DEFAULT_GESTATION_PERIOD = 144  # Default gestation period in days
+from change_events import change_notifier
+from farm_logging import setup_logging, log_operation
+from farm_rules import DEFAULT_GESTATION_PERIOD, next_batch_number
+from farm_schema import create_registration_table
+from herd_model import HerdFrame, CHUNK_SIZE, select_registrations, to_count
+from storage import FARM_DATABASE, resolve_storage
 
 # Setup logging
-logging.basicConfig(filename='pig_database.log', level=logging.ERROR)
+setup_logging()
 
 class PigRegistrationApp:
-    def __init__(self, window):
+    def __init__(self, window, storage=None):
         self.window = window
         self.window.title("Pig Registration Form")
 
         # Initialize database connection
-        self.conn, self.cursor = self.initialize_database()
+        self.conn, self.cursor = self.initialize_database(storage)
 
         # Create and place labels, entry fields, and buttons
         Label(window, text="Date of Birth:").grid(row=0, column=0)
@@ -48,23 +51,14 @@ class PigRegistrationApp:
         window.grid_columnconfigure(0, weight=1)
         window.grid_columnconfigure(1, weight=1)
 
-    def initialize_database(self):
+    def initialize_database(self, storage=None):
         try:
             # Create a SQLite database connection
-            conn = sqlite3.connect('farm_database.db')
+            conn = resolve_storage(storage, FARM_DATABASE).connect()
             cursor = conn.cursor()
 
             # Create a table to store pig registration data if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS pig_registration (
-                    id INTEGER PRIMARY KEY,
-                    batch_number TEXT,
-                    dob DATE,
-                    males INTEGER,
-                    females INTEGER,
-                    mother_id TEXT
-                )
-            ''')
+            create_registration_table(cursor)
 
             conn.commit()
 
@@ -101,28 +95,28 @@ class PigRegistrationApp:
 
     def insert_data_into_database(self, batch_number, dob, males, females, mother_id):
         try:
-            self.cursor.execute("INSERT INTO pig_registration (batch_number, dob, males, females, mother_id) VALUES (?, ?, ?, ?, ?)",
-                            (batch_number, dob, males, females, mother_id))
-            self.conn.commit()
-            return True
+            with log_operation("register_pig", batch_number):
+                self.cursor.execute("INSERT INTO pig_registration (batch_number, dob, males, females, mother_id) VALUES (?, ?, ?, ?, ?)",
+                                (batch_number, dob, males, females, mother_id))
+                self.conn.commit()
 
         except Exception as e:
             logging.error(f"Error inserting data into the database: {e}")
             messagebox.showerror("Database Error", f"Failed to insert data into the database. {e}")
             return False
 
+        # The row is committed, so a problem telling the open views only gets logged
+        try:
+            # Let open views add the new batch without re-querying
+            age = (datetime.now().date() - datetime.strptime(dob, '%Y-%m-%d').date()).days
+            change_notifier.publish("pig_registration", "insert", batch_number,
+                                    {"males": to_count(males), "females": to_count(females), "age": age})
+        except Exception as e:
+            logging.error(f"Error notifying views about batch {batch_number}: {e}")
+        return True
+
     def generate_batch_number(self):
-        # Example: A001, A002, ..., Z999
-        last_batch_number = self.get_last_batch_number()
-        if last_batch_number:
-            prefix = chr(((ord(last_batch_number[0]) - ord('A') + 1) % 26) + ord('A'))
-            number = str(int(last_batch_number[1:]) + 1).zfill(3)
-        else:
-            # If no batches are registered yet
-            prefix = 'A'
-            number = '001'
-
-        return f"{prefix}{number}"
+        return next_batch_number(self.get_last_batch_number())
 
     def get_last_batch_number(self):
         try:
@@ -148,9 +142,6 @@ class PigRegistrationApp:
             # Configure the Text widget to expand with the window
             batches_text_widget.config(wrap="none")  # Disable automatic line wrapping
 
-            # Fetch registered batches and their information from the database
-            batches_data = self.get_batch_information()
-
             # Display titles
             titles = ["Batch Number", "Date of Birth", "Males", "Females", "Mother ID", "Age (Days)"]
             for col, title in enumerate(titles):
@@ -159,18 +150,17 @@ class PigRegistrationApp:
                 batches_text_widget.tag_config("title", font=('bold', 10), underline=True)
             batches_text_widget.insert("end", "\n\n")
 
-            # Display registered batches and their information in the text widget
-            if batches_data:
-                for row, batch in enumerate(batches_data, start=2):
-                    for col, value in enumerate(batch):
-                        if col != 5:  # Skip the last column (Age)
-                            batches_text_widget.insert("end", f"{value}\t\t")
-                    # Calculate and display age (current date - date of birth)
-                    dob = datetime.strptime(batch[1], '%Y-%m-%d').date()
-                    age = (datetime.now().date() - dob).days
-                    batches_text_widget.insert("end", f"{age}\t\t")
+            # Stream registered batches into the text widget chunk by chunk
+            has_batches = False
+            for batches_chunk in self.iter_batch_information():
+                has_batches = True
+                for batch in batches_chunk.rows():
+                    for value in batch:
+                        batches_text_widget.insert("end", f"{value}\t\t")
                     batches_text_widget.insert("end", "\n")
-            else:
+                view_batches_window.update_idletasks()
+
+            if not has_batches:
                 batches_text_widget.insert("end", "No registered batches.")
 
             # Add a close button to the window
@@ -196,20 +186,13 @@ class PigRegistrationApp:
 
     def get_batch_information(self):
         try:
-            self.cursor.execute("SELECT batch_number, dob, males, females, mother_id FROM pig_registration")
-            batches_data = self.cursor.fetchall()
+            # Age is computed by SQLite as the rows are read into the frame
+            batches_data = HerdFrame.from_registrations(self.cursor)
 
             # Check if there are any registered batches
             if not batches_data:
                 return None
 
-            # Calculate the age of each batch based on the date of birth
-            today = datetime.now().date()
-            for index, batch in enumerate(batches_data):
-                dob = datetime.strptime(batch[1], '%Y-%m-%d').date()
-                age = (today - dob).days
-                batches_data[index] = (*batch, age)
-
             return batches_data
 
         except Exception as e:
@@ -217,6 +200,16 @@ class PigRegistrationApp:
             messagebox.showerror("Database Error", "Failed to fetch data from the database.")
             return None
 
+    def iter_batch_information(self, chunk_size=CHUNK_SIZE, cancel_event=None):
+        # Own cursor so other queries on self.cursor don't reset the stream
+        try:
+            cursor = select_registrations(self.conn.cursor())
+            yield from HerdFrame.iter_frames(cursor, chunk_size, cancel_event)
+
+        except sqlite3.Error as e:
+            logging.error(f"Error streaming batch information from the database: {e}")
+            messagebox.showerror("Database Error", "Failed to fetch data from the database.")
+
 if __name__ == "__main__":
     pig_registration_app = PigRegistrationApp(Tk())
     pig_registration_app.window.mainloop()
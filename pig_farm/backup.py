@@ -0,0 +1,153 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from farm_logging import setup_logging, log_operation
+from storage import BREEDING_DATABASE, DATA_DIR, FARM_DATABASE, RECORDS_DATABASE, file_storage
+
+# Constants
+BACKUP_PAGES_PER_STEP = 256  # Pages copied before the source lock is released
+BACKUP_STEP_SLEEP = 0.05  # Seconds to yield to writers between steps
+BACKUP_RETENTION = 7  # Snapshots kept per database
+BACKUP_INTERVAL = 24 * 60 * 60  # Seconds between scheduled backups
+BACKUP_DIR = os.path.join(DATA_DIR, 'backups')
+
+# Setup logging
+setup_logging()
+
+class BackupService:
+    def __init__(self, db_paths=(FARM_DATABASE, BREEDING_DATABASE, RECORDS_DATABASE), backup_dir=BACKUP_DIR,
+                 pages_per_step=BACKUP_PAGES_PER_STEP, step_sleep=BACKUP_STEP_SLEEP, retention=BACKUP_RETENTION):
+        self.db_paths = list(db_paths)
+        self.backup_dir = backup_dir
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.retention = retention
+        self.stop_event = threading.Event()
+        self.thread = None
+        os.makedirs(backup_dir, exist_ok=True)
+
+    def snapshot_prefix(self, db_path):
+        return os.path.splitext(os.path.basename(db_path))[0] + '-'
+
+    def list_snapshots(self, db_path):
+        prefix = self.snapshot_prefix(db_path)
+        return sorted(os.path.join(self.backup_dir, name) for name in os.listdir(self.backup_dir)
+                      if name.startswith(prefix) and name.endswith('.db'))
+
+    def backup_database(self, db_path, progress=None):
+        """Copy one database in small page steps and return the verified snapshot path, or None."""
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        snapshot_path = os.path.join(self.backup_dir, f"{self.snapshot_prefix(db_path)}{timestamp}.db")
+        partial_path = snapshot_path + '.partial'
+
+        source = None
+        target = None
+        try:
+            # Writable only so the journal mode can be switched; the backup itself never writes to the source.
+            # mode=rw fails on a missing file instead of creating an empty one
+            source = sqlite3.connect(file_storage(db_path).uri + "?mode=rw", uri=True, isolation_level=None)
+            target = sqlite3.connect(partial_path)
+
+            if self.enable_wal(source, db_path):
+                # A pinned read snapshot keeps the copy consistent while the apps keep writing,
+                # so each step copies only pages_per_step pages before yielding
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                source.backup(target, pages=self.pages_per_step, progress=progress, sleep=self.step_sleep)
+            else:
+                # With a rollback journal every write restarts a stepped copy, so copy in one step;
+                # writers wait for the read lock instead of the copy never finishing
+                logging.warning(f"Backing up {db_path} in a single step because it could not be switched to WAL mode")
+                source.backup(target, pages=-1, progress=progress)
+            if source.in_transaction:
+                source.execute("COMMIT")
+            # Snapshots are standalone files, so don't carry WAL mode over from the source
+            target.execute("PRAGMA journal_mode=DELETE")
+            target.close()
+            target = None
+
+            if not self.verify_snapshot(partial_path):
+                logging.error(f"Backup of {db_path} failed the integrity check")
+                os.remove(partial_path)
+                return None
+
+            os.replace(partial_path, snapshot_path)
+            self.apply_retention(db_path)
+            return snapshot_path
+
+        except sqlite3.Error as e:
+            logging.error(f"Error backing up {db_path}: {e}")
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return None
+
+        finally:
+            if target:
+                target.close()
+            if source:
+                source.close()
+
+    def enable_wal(self, conn, db_path):
+        """Switch the source to WAL, which stays set in the file; returns False if it stays in rollback mode."""
+        try:
+            return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0] == 'wal'
+        except sqlite3.Error as e:
+            logging.error(f"Error switching {db_path} to WAL mode: {e}")
+            return False
+
+    def verify_snapshot(self, snapshot_path):
+        try:
+            conn = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+            try:
+                return conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logging.error(f"Error verifying snapshot {snapshot_path}: {e}")
+            return False
+
+    def apply_retention(self, db_path):
+        snapshots = self.list_snapshots(db_path)
+        for old_snapshot in snapshots[:max(len(snapshots) - self.retention, 0)]:
+            try:
+                os.remove(old_snapshot)
+            except OSError as e:
+                logging.error(f"Error removing old snapshot {old_snapshot}: {e}")
+
+    def backup_all(self):
+        with log_operation("backup_all"):
+            results = {}
+            for db_path in self.db_paths:
+                # A missing database is a failed backup, not one to skip quietly
+                if not os.path.exists(db_path):
+                    logging.error(f"Database to back up not found: {db_path}")
+                    results[db_path] = None
+                    continue
+                results[db_path] = self.backup_database(db_path)
+            return results
+
+    def start(self, interval=BACKUP_INTERVAL):
+        """Run backup_all every interval seconds on a daemon thread."""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, args=(interval,), name='farm-backup', daemon=True)
+        self.thread.start()
+
+    def run(self, interval):
+        while not self.stop_event.is_set():
+            self.backup_all()
+            self.stop_event.wait(interval)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+if __name__ == "__main__":
+    backup_service = BackupService()
+    for db_path, snapshot_path in backup_service.backup_all().items():
+        print(f"{db_path} -> {snapshot_path or 'FAILED'}")
@@ -0,0 +1,28 @@
+import logging
+from collections import defaultdict
+
+class ChangeNotifier:
+    """Publish row-level changes so open views can patch themselves instead of re-querying."""
+
+    def __init__(self):
+        self.subscribers = defaultdict(list)
+
+    def subscribe(self, table, callback):
+        # callback(action, key, changes) where action is 'insert', 'update' or 'delete'
+        self.subscribers[table].append(callback)
+
+    def unsubscribe(self, table, callback):
+        try:
+            self.subscribers[table].remove(callback)
+        except ValueError:
+            pass
+
+    def publish(self, table, action, key, changes=None):
+        for callback in list(self.subscribers[table]):
+            try:
+                callback(action, key, changes or {})
+            except Exception as e:
+                logging.error(f"Error notifying {table} subscriber of {action} on {key}: {e}")
+
+# Shared by every app running in the same process
+change_notifier = ChangeNotifier()
@@ -0,0 +1,401 @@
+import asyncio
+import functools
+import json
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, parse_qs
+
+from farm_logging import setup_logging, log_operation
+from farm_rules import DEFAULT_GESTATION_PERIOD, SLAUGHTER_AGE_THRESHOLD, find_feed_band, next_batch_number
+from farm_schema import attach_breeding, create_farm_tables
+from herd_model import to_count
+from storage import BREEDING_DATABASE, FARM_DATABASE, resolve_storage
+
+# Constants
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+READ_POOL_SIZE = 4
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+FARROWING_WINDOW_DAYS = 7  # Default look-ahead for the farrowing due list
+FEED_PROJECTION_DAYS = 14  # Default look-ahead for feed projections
+MAX_BODY_SIZE = 64 * 1024
+
+# Setup logging
+setup_logging()
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class ReadPool:
+    """Fixed set of read-only connections handed out to request handlers."""
+
+    def __init__(self, farm_db_path, breeding_db_path, size=READ_POOL_SIZE):
+        farm_storage = resolve_storage(farm_db_path, FARM_DATABASE).as_read_only()
+        breeding_storage = resolve_storage(breeding_db_path, BREEDING_DATABASE).as_read_only()
+        # Every connect() to a private in-memory database opens a new, empty one, so the pool could never see the data
+        for storage in (farm_storage, breeding_storage):
+            if storage.kind == 'memory' and storage.location is None:
+                raise ValueError("The API needs a file or a shared in-memory database, not a private ':memory:' one")
+
+        self.connections = asyncio.Queue()
+        for _ in range(size):
+            conn = farm_storage.connect(check_same_thread=False)
+            conn.execute("ATTACH DATABASE ? AS breeding", (breeding_storage.uri,))
+            self.connections.put_nowait(conn)
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='farm-api-read')
+
+    async def run(self, query, *args):
+        conn = await self.connections.get()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, query, conn, *args)
+        finally:
+            self.connections.put_nowait(conn)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        while not self.connections.empty():
+            self.connections.get_nowait().close()
+
+class Writer:
+    """Single writer connection; every write runs on the same thread, one at a time."""
+
+    def __init__(self, farm_db_path, breeding_db_path):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='farm-api-write')
+        self.conn = self.executor.submit(self.initialize_database, farm_db_path, breeding_db_path).result()
+
+    @staticmethod
+    def initialize_database(farm_db_path, breeding_db_path):
+        conn = resolve_storage(farm_db_path, FARM_DATABASE).connect()
+        # WAL lets the read pool keep serving while the writer commits
+        conn.execute("PRAGMA journal_mode=WAL")
+        create_farm_tables(conn)
+        attach_breeding(conn, resolve_storage(breeding_db_path, BREEDING_DATABASE))
+        conn.commit()
+        return conn
+
+    async def run(self, operation, *args, batch_number=None):
+        transaction = functools.partial(self.transaction, operation, *args, batch_number=batch_number)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, transaction)
+
+    def transaction(self, operation, *args, batch_number=None):
+        try:
+            with log_operation(operation.__name__, batch_number) as fields:
+                result = operation(self.conn, *args)
+                self.conn.commit()
+                # Registrations only get their batch number inside the transaction
+                if isinstance(result, dict) and result.get("batch_number") is not None:
+                    fields["batch_number"] = result["batch_number"]
+            return result
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def close(self):
+        self.executor.submit(self.conn.close).result()
+        self.executor.shutdown(wait=True)
+
+# Read queries, each run on a pooled read-only connection
+
+def fetch_page(conn, count_sql, count_params, select_sql, select_params, page, page_size):
+    total = conn.execute(count_sql, count_params).fetchone()[0]
+    cursor = conn.execute(f"{select_sql} LIMIT ? OFFSET ?", (*select_params, page_size, (page - 1) * page_size))
+    columns = [column[0] for column in cursor.description]
+    items = [dict(zip(columns, row)) for row in cursor]
+    return {"items": items, "page": page, "page_size": page_size, "total": total}
+
+def query_registrations(conn, page, page_size, today):
+    return fetch_page(conn,
+                      "SELECT COUNT(*) FROM pig_registration", (),
+                      "SELECT batch_number, dob, males, females, mother_id, "
+                      "CAST(julianday(?) - julianday(dob) AS INTEGER) AS age "
+                      "FROM pig_registration ORDER BY id", (str(today),),
+                      page, page_size)
+
+def query_slaughter_eligible(conn, page, page_size, today):
+    cutoff = str(today - timedelta(days=SLAUGHTER_AGE_THRESHOLD))
+    return fetch_page(conn,
+                      "SELECT COUNT(*) FROM pig_registration WHERE dob <= ? AND males + females > 0", (cutoff,),
+                      "SELECT batch_number, males, females, "
+                      "CAST(julianday(?) - julianday(dob) AS INTEGER) AS age "
+                      "FROM pig_registration WHERE dob <= ? AND males + females > 0 ORDER BY dob", (str(today), cutoff),
+                      page, page_size)
+
+def query_farrowing_due(conn, page, page_size, today, days):
+    window = (str(today), str(today + timedelta(days=days)))
+    return fetch_page(conn,
+                      "SELECT COUNT(*) FROM breeding.pig_breeding WHERE expected_birth_date BETWEEN ? AND ?", window,
+                      "SELECT pig_id, served_date, expected_birth_date, "
+                      "CAST(julianday(expected_birth_date) - julianday(?) AS INTEGER) AS days_left "
+                      "FROM breeding.pig_breeding WHERE expected_birth_date BETWEEN ? AND ? "
+                      "ORDER BY expected_birth_date", (str(today), *window),
+                      page, page_size)
+
+def query_feed_projections(conn, page, page_size, today, days):
+    page_data = fetch_page(conn,
+                           "SELECT COUNT(*) FROM pig_registration", (),
+                           "SELECT batch_number, males + females AS pigs, "
+                           "CAST(julianday(?) - julianday(dob) AS INTEGER) AS age "
+                           "FROM pig_registration ORDER BY id", (str(today),),
+                           page, page_size)
+    for item in page_data["items"]:
+        # Batches without a usable dob have no age, so they are listed without feed
+        if item["age"] is None:
+            item["current_feed"] = item["projected_feed"] = item["projection_date"] = None
+            continue
+        current_band = find_feed_band(item["age"])
+        projected_band = find_feed_band(item["age"] + days)
+        item["current_feed"] = current_band[2] if current_band else None
+        item["projected_feed"] = projected_band[2] if projected_band else None
+        item["projection_date"] = str(today + timedelta(days=days))
+    return page_data
+
+# Write operations, each run inside the single writer's transaction
+
+def write_registration(conn, dob, males, females, mother_id):
+    last_batch = conn.execute("SELECT batch_number FROM pig_registration ORDER BY id DESC LIMIT 1").fetchone()
+    batch_number = next_batch_number(last_batch[0] if last_batch else None)
+    conn.execute("INSERT INTO pig_registration (batch_number, dob, males, females, mother_id) VALUES (?, ?, ?, ?, ?)",
+                 (batch_number, dob, males, females, mother_id))
+    return {"batch_number": batch_number}
+
+def write_slaughter(conn, batch_number, slaughtered_male_count, slaughtered_female_count, user_id, avg_weight, today):
+    current_numbers = conn.execute("SELECT males, females FROM pig_registration WHERE batch_number=?",
+                                   (batch_number,)).fetchone()
+    if current_numbers is None:
+        raise HTTPError(404, f"Unknown batch {batch_number}")
+    current_males, current_females = (to_count(count) for count in current_numbers)
+    if current_males is None or current_females is None or current_males < 0 or current_females < 0:
+        raise HTTPError(409, f"Batch {batch_number} has invalid stored counts; correct them before slaughtering")
+
+    new_males_count = max(current_males - slaughtered_male_count, 0)
+    new_females_count = max(current_females - slaughtered_female_count, 0)
+    conn.execute("UPDATE pig_registration SET males=?, females=? WHERE batch_number=?",
+                 (new_males_count, new_females_count, batch_number))
+    conn.execute("INSERT INTO slaughter_information (batch_number, user_id, males_slaughtered, females_slaughtered, avg_weight, date_slaughtered) VALUES (?, ?, ?, ?, ?, ?)",
+                 (batch_number, user_id, slaughtered_male_count, slaughtered_female_count, avg_weight, str(today)))
+    return {"batch_number": batch_number, "males": new_males_count, "females": new_females_count}
+
+def write_breeding(conn, pig_id, served_date):
+    expected_birth_date = served_date + timedelta(days=DEFAULT_GESTATION_PERIOD)
+    conn.execute("INSERT INTO breeding.pig_breeding (pig_id, served_date, expected_birth_date) VALUES (?, ?, ?)",
+                 (pig_id, str(served_date), str(expected_birth_date)))
+    return {"pig_id": pig_id, "expected_birth_date": str(expected_birth_date)}
+
+# Request parsing helpers
+
+def parse_int(value, name, minimum=0):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"'{name}' must be an integer")
+    if number < minimum:
+        raise HTTPError(400, f"'{name}' must be at least {minimum}")
+    return number
+
+def parse_float(value, name, minimum=0.0):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"'{name}' must be a number")
+    if not math.isfinite(number) or number < minimum:
+        raise HTTPError(400, f"'{name}' must be a number of at least {minimum:g}")
+    return number
+
+def parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"'{name}' must be a date in YYYY-MM-DD format")
+
+def parse_pagination(params):
+    page = parse_int(params.get('page', 1), 'page', minimum=1)
+    page_size = min(parse_int(params.get('page_size', DEFAULT_PAGE_SIZE), 'page_size', minimum=1), MAX_PAGE_SIZE)
+    return page, page_size
+
+class FarmAPIServer:
+    def __init__(self, farm_db_path=None, breeding_db_path=None,
+                 host=DEFAULT_HOST, port=DEFAULT_PORT, read_pool_size=READ_POOL_SIZE):
+        self.farm_db_path = farm_db_path
+        self.breeding_db_path = breeding_db_path
+        self.host = host
+        self.port = port
+        self.read_pool_size = read_pool_size
+        self.writer = None
+        self.read_pool = None
+        self.server = None
+
+    async def start(self):
+        # The writer creates the schema before the read-only connections are opened
+        self.writer = Writer(self.farm_db_path, self.breeding_db_path)
+        self.read_pool = ReadPool(self.farm_db_path, self.breeding_db_path, self.read_pool_size)
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.read_pool:
+            self.read_pool.close()
+        if self.writer:
+            self.writer.close()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                content_length = int(headers.get('content-length', 0))
+                if content_length > MAX_BODY_SIZE:
+                    await self.send_response(writer, 413, {"error": "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(content_length) if content_length else b''
+
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.send_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logging.error(f"Error handling API connection: {e}")
+        finally:
+            writer.close()
+
+    async def send_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode('utf-8')
+        reason = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+                  405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}.get(status, '')
+        head = (f"HTTP/1.1 {status} {reason}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        today = datetime.now().date()
+        try:
+            if method == 'GET':
+                page, page_size = parse_pagination(params)
+                if url.path == '/registrations':
+                    return 200, await self.read_pool.run(query_registrations, page, page_size, today)
+                if url.path == '/slaughter-eligible':
+                    return 200, await self.read_pool.run(query_slaughter_eligible, page, page_size, today)
+                if url.path == '/farrowing-due':
+                    days = parse_int(params.get('days', FARROWING_WINDOW_DAYS), 'days')
+                    return 200, await self.read_pool.run(query_farrowing_due, page, page_size, today, days)
+                if url.path == '/feed-projections':
+                    days = parse_int(params.get('days', FEED_PROJECTION_DAYS), 'days')
+                    return 200, await self.read_pool.run(query_feed_projections, page, page_size, today, days)
+                raise HTTPError(404, f"Unknown path {url.path}")
+
+            if method == 'POST':
+                try:
+                    data = json.loads(body or b'{}')
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    raise HTTPError(400, "Request body must be JSON")
+                if not isinstance(data, dict):
+                    raise HTTPError(400, "Request body must be a JSON object")
+
+                if url.path == '/registrations':
+                    dob = parse_date(data.get('dob'), 'dob')
+                    return 201, await self.writer.run(write_registration, str(dob),
+                                                      parse_int(data.get('males'), 'males'),
+                                                      parse_int(data.get('females'), 'females'),
+                                                      str(data.get('mother_id', '')))
+                if url.path == '/slaughter':
+                    avg_weight = data.get('avg_weight')
+                    batch_number = str(data.get('batch_number', ''))
+                    return 200, await self.writer.run(write_slaughter, batch_number,
+                                                      parse_int(data.get('males', 0), 'males'),
+                                                      parse_int(data.get('females', 0), 'females'),
+                                                      str(data.get('user_id', 'api')),
+                                                      parse_float(avg_weight, 'avg_weight') if avg_weight is not None else None,
+                                                      today, batch_number=batch_number)
+                if url.path == '/breeding':
+                    pig_id = str(data.get('pig_id', '')).strip()
+                    if not pig_id:
+                        raise HTTPError(400, "'pig_id' is required")
+                    return 201, await self.writer.run(write_breeding, pig_id,
+                                                      parse_date(data.get('served_date'), 'served_date'))
+                raise HTTPError(404, f"Unknown path {url.path}")
+
+            raise HTTPError(405, f"Method {method} not allowed")
+
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except Exception as e:
+            logging.error(f"Error handling {method} {target}: {e}")
+            return 500, {"error": "Internal server error. Please check the logs."}
+
+async def run_load_test(host=DEFAULT_HOST, port=DEFAULT_PORT, path='/registrations', clients=100, requests_per_client=20):
+    """Hit one endpoint from many concurrent keep-alive clients and report throughput."""
+    latencies = []
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for _ in range(requests_per_client):
+                started = time.perf_counter()
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+                await writer.drain()
+                await reader.readline()
+                content_length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    if name.strip().lower() == 'content-length':
+                        content_length = int(value)
+                await reader.readexactly(content_length)
+                latencies.append(time.perf_counter() - started)
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+if __name__ == "__main__":
+    farm_api_server = FarmAPIServer()
+    try:
+        asyncio.run(farm_api_server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,170 @@
+import csv
+import heapq
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from itertools import islice
+from operator import itemgetter
+from tkinter import Tk, Text, ttk, filedialog, messagebox
+
+from farm_logging import setup_logging, log_operation
+from farm_rules import FEED_DATA, SLAUGHTER_AGE_THRESHOLD
+from herd_model import CHUNK_SIZE, iter_rows
+from storage import BREEDING_DATABASE, FARM_DATABASE, resolve_storage
+
+# Constants
+CALENDAR_DAYS = 365
+CALENDAR_PAGE_SIZE = 50
+EVENT_KINDS = ('farrowing', 'slaughter', 'feed_change')
+
+# Setup logging
+setup_logging()
+
+# Events are (date, kind, reference, detail) tuples; ISO dates sort correctly as text
+event_date = itemgetter(0)
+
+def open_calendar_connection(farm_db_path=None, breeding_db_path=None):
+    conn = resolve_storage(farm_db_path, FARM_DATABASE).as_read_only().connect()
+    conn.execute("ATTACH DATABASE ? AS breeding", (resolve_storage(breeding_db_path, BREEDING_DATABASE).as_read_only().uri,))
+    return conn
+
+def iter_farrowing_events(conn, start, end, chunk_size=CHUNK_SIZE):
+    cursor = conn.cursor()
+    cursor.execute("SELECT expected_birth_date, pig_id, served_date FROM breeding.pig_breeding "
+                   "WHERE expected_birth_date BETWEEN ? AND ? ORDER BY expected_birth_date",
+                   (str(start), str(end)))
+    for due_date, pig_id, served_date in iter_rows(cursor, chunk_size):
+        yield due_date, 'farrowing', pig_id, f"Sow {pig_id} due to farrow (served {served_date})"
+
+def iter_batch_milestones(conn, start, end, age, chunk_size=CHUNK_SIZE):
+    """(date, batch_number) for every batch with pigs that reaches the given age within the window, by date."""
+    # Shifting the window back by the age keeps this a range scan on the dob index
+    cursor = conn.cursor()
+    cursor.execute("SELECT date(dob, ?), batch_number FROM pig_registration "
+                   "WHERE dob BETWEEN ? AND ? AND males + females > 0 ORDER BY dob",
+                   (f"+{age} days", str(start - timedelta(days=age)), str(end - timedelta(days=age))))
+    for milestone_date, batch_number in iter_rows(cursor, chunk_size):
+        # date() gives NULL for unparseable dob values
+        if milestone_date is not None:
+            yield milestone_date, batch_number
+
+def iter_slaughter_events(conn, start, end, chunk_size=CHUNK_SIZE):
+    for eligible_date, batch_number in iter_batch_milestones(conn, start, end, SLAUGHTER_AGE_THRESHOLD, chunk_size):
+        yield eligible_date, 'slaughter', batch_number, f"Batch {batch_number} reaches slaughter age ({SLAUGHTER_AGE_THRESHOLD} days)"
+
+def iter_feed_change_events(conn, start, end, chunk_size=CHUNK_SIZE):
+    # One date-ordered stream per feed band after breastfeeding, merged into one
+    def band_events(start_day, feed):
+        for change_date, batch_number in iter_batch_milestones(conn, start, end, start_day, chunk_size):
+            yield change_date, 'feed_change', batch_number, f"Batch {batch_number} moves to {feed} (day {start_day})"
+
+    return heapq.merge(*(band_events(start_day, feed) for start_day, _, feed, _ in FEED_DATA[1:]), key=event_date)
+
+EVENT_SOURCES = {
+    'farrowing': iter_farrowing_events,
+    'slaughter': iter_slaughter_events,
+    'feed_change': iter_feed_change_events,
+}
+
+def iter_calendar(conn, start=None, end=None, kinds=EVENT_KINDS, chunk_size=CHUNK_SIZE):
+    """Every event between start and end inclusive, in date order, merged lazily from the per-source streams."""
+    start = start or datetime.now().date()
+    end = end or start + timedelta(days=CALENDAR_DAYS)
+    return heapq.merge(*(EVENT_SOURCES[kind](conn, start, end, chunk_size) for kind in kinds), key=event_date)
+
+def calendar_page(conn, page, page_size=CALENDAR_PAGE_SIZE, start=None, end=None, kinds=EVENT_KINDS):
+    events = iter_calendar(conn, start, end, kinds)
+    return list(islice(events, (page - 1) * page_size, page * page_size))
+
+def export_calendar(conn, path, start=None, end=None, kinds=EVENT_KINDS):
+    with log_operation("export_calendar"):
+        exported = 0
+        with open(path, 'w', newline='') as calendar_file:
+            writer = csv.writer(calendar_file)
+            writer.writerow(["Date", "Event", "Reference", "Details"])
+            for event in iter_calendar(conn, start, end, kinds):
+                writer.writerow(event)
+                exported += 1
+        return exported
+
+class CalendarViewApp:
+    def __init__(self, window, farm_db_path=None, breeding_db_path=None):
+        self.window = window
+        self.window.title("Upcoming Events")
+
+        try:
+            self.conn = open_calendar_connection(farm_db_path, breeding_db_path)
+        except sqlite3.Error as e:
+            logging.error(f"Error opening the calendar databases: {e}")
+            messagebox.showerror("Database Error", "Failed to open the farm databases.")
+            self.conn = None
+
+        self.events_text_widget = Text(window, wrap="none")
+        self.events_text_widget.grid(row=0, column=0, columnspan=3, sticky="nsew")
+
+        scrollbar = ttk.Scrollbar(window, command=self.events_text_widget.yview)
+        self.events_text_widget.config(yscrollcommand=scrollbar.set)
+        scrollbar.grid(row=0, column=3, sticky="ns")
+
+        self.previous_button = ttk.Button(window, text="Previous", command=self.show_previous_page)
+        self.previous_button.grid(row=1, column=0)
+        self.next_button = ttk.Button(window, text="Next", command=self.show_next_page)
+        self.next_button.grid(row=1, column=1)
+        ttk.Button(window, text="Export", command=self.export_events).grid(row=1, column=2)
+
+        window.grid_rowconfigure(0, weight=1)
+        window.grid_columnconfigure(0, weight=1)
+        window.grid_columnconfigure(1, weight=1)
+        window.grid_columnconfigure(2, weight=1)
+
+        # Next pulls the following page from the live stream; Previous restarts it
+        self.page = 0
+        self.events = None
+        self.show_next_page()
+
+    def show_page(self, events):
+        self.events_text_widget.delete("1.0", "end")
+        for date, kind, reference, detail in events:
+            self.events_text_widget.insert("end", f"{date}\t{kind}\t{detail}\n")
+        if not events:
+            self.events_text_widget.insert("end", "No upcoming events.")
+        self.previous_button["state"] = "normal" if self.page > 1 else "disabled"
+        self.next_button["state"] = "normal" if len(events) == CALENDAR_PAGE_SIZE else "disabled"
+
+    def show_next_page(self):
+        if self.conn is None:
+            return
+        try:
+            if self.events is None:
+                self.events = iter_calendar(self.conn)
+            self.page += 1
+            self.show_page(list(islice(self.events, CALENDAR_PAGE_SIZE)))
+        except sqlite3.Error as e:
+            logging.error(f"Error reading upcoming events: {e}")
+            messagebox.showerror("Database Error", "Failed to fetch data from the database.")
+
+    def show_previous_page(self):
+        if self.conn is None or self.page <= 1:
+            return
+        try:
+            self.page -= 1
+            self.events = iter_calendar(self.conn)
+            self.show_page(list(islice(self.events, (self.page - 1) * CALENDAR_PAGE_SIZE, self.page * CALENDAR_PAGE_SIZE)))
+        except sqlite3.Error as e:
+            logging.error(f"Error reading upcoming events: {e}")
+            messagebox.showerror("Database Error", "Failed to fetch data from the database.")
+
+    def export_events(self):
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if not path:
+            return
+        try:
+            exported = export_calendar(self.conn, path)
+            messagebox.showinfo("Success", f"Exported {exported} events.")
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Error exporting the calendar: {e}")
+            messagebox.showerror("Error", "Failed to export the calendar. Please check the logs.")
+
+if __name__ == "__main__":
+    calendar_view_app = CalendarViewApp(Tk())
+    calendar_view_app.window.mainloop()
@@ -0,0 +1,121 @@
+import itertools
+import os
+import random
+from datetime import datetime, timedelta
+
+from farm_schema import attach_breeding, create_farm_tables
+from farm_sync import enable_change_capture
+from feed_inventory import FEED_TYPES, FeedInventory
+from health_screening import HealthScreening
+from herd_ledger import HerdLedger
+from integrity_check import create_quarantine_table
+from lineage import LineageIndex
+from pig_database import PigDatabase
+from storage import BREEDING_DATABASE, FARM_DATABASE, resolve_storage, shared_memory_storage
+
+# Constants
+FIXTURE_ROWS = 10_000
+FIXTURE_DAYS = 20 * 365  # Registrations are spread evenly over this many days before today
+SOW_COUNT = 2000
+FEED_DAYS = 30  # Days of feed deliveries and consumption rollups before today
+
+fixture_numbers = itertools.count(1)
+
+def seed_databases(farm, breeding, records, rows=FIXTURE_ROWS, seed=1, today=None):
+    """Fill the farm, breeding and pig_records databases with generated data.
+
+    Every table and index comes from the code the apps and services create them with, so dropping an index there
+    shows up in the plan checks. Each argument is a path, a 'file:' URI or a StorageBackend.
+    """
+    rng = random.Random(seed)
+    today = today or datetime.now().date()
+    start = today - timedelta(days=FIXTURE_DAYS)
+
+    conn = resolve_storage(farm, FARM_DATABASE).connect()
+    try:
+        create_farm_tables(conn)
+        attach_breeding(conn, resolve_storage(breeding, BREEDING_DATABASE))
+        create_quarantine_table(conn)
+        # Captured from the start, so change_log and sync_rows hold a row for every seeded row
+        enable_change_capture(conn)
+        conn.executemany("INSERT INTO pig_registration (batch_number, dob, males, females, mother_id) VALUES (?, ?, ?, ?, ?)",
+                         ((f"B{i:06d}", str(start + timedelta(days=i * FIXTURE_DAYS // rows)), rng.randint(0, 8),
+                           rng.randint(0, 8), f"S{rng.randint(1, SOW_COUNT)}") for i in range(rows)))
+        conn.executemany("INSERT INTO slaughter_information (batch_number, user_id, males_slaughtered, females_slaughtered, avg_weight, date_slaughtered) "
+                         "VALUES (?, 'user123', ?, ?, 75.5, ?)",
+                         ((f"B{rng.randrange(rows):06d}", rng.randint(0, 4), rng.randint(0, 4),
+                           str(start + timedelta(days=rng.randrange(FIXTURE_DAYS)))) for _ in range(rows // 3)))
+        conn.executemany("INSERT INTO breeding.pig_breeding (pig_id, served_date, expected_birth_date) VALUES (?, ?, ?)",
+                         ((f"S{i % SOW_COUNT}", str(served), str(served + timedelta(days=144)))
+                          for i, served in ((i, start + timedelta(days=rng.randrange(FIXTURE_DAYS))) for i in range(rows // 5))))
+        conn.commit()
+    finally:
+        conn.close()
+
+    records_db = PigDatabase(records)
+    try:
+        records_db.c.executemany('INSERT INTO pig_records (batch_number, mother_id, date_born, male_pigs, female_pigs, age_in_days) '
+                                 'VALUES (?, ?, ?, ?, ?, ?)',
+                                 ((i, rng.randint(1, SOW_COUNT), start + timedelta(days=i * FIXTURE_DAYS // rows),
+                                   rng.randint(0, 8), rng.randint(0, 8), None) for i in range(rows)))
+        records_db.conn.commit()
+    finally:
+        records_db.close_connection()
+
+    # The services build their own tables from the seeded rows
+    herd_ledger = HerdLedger(farm)
+    try:
+        herd_ledger.refresh()
+    finally:
+        herd_ledger.close_database()
+
+    lineage_index = LineageIndex(farm, breeding)
+    try:
+        lineage_index.refresh()
+        # Most sows were born on the farm, which links them to their mothers' litters
+        for sow in range(2, SOW_COUNT + 1):
+            lineage_index.record_birth_litter(f"S{sow}", f"B{rng.randrange(rows):06d}")
+    finally:
+        lineage_index.close_database()
+
+    feed_inventory = FeedInventory(farm)
+    try:
+        for feed_type in FEED_TYPES:
+            feed_inventory.record_delivery(feed_type, 1000.0, today - timedelta(days=FEED_DAYS))
+        feed_inventory.roll_up(today - timedelta(days=1))
+    finally:
+        feed_inventory.close_database()
+
+    screening = HealthScreening(farm)
+    try:
+        screening.record_weights(((f"B{i:06d}", round(rng.uniform(5, 120), 1)) for i in range(0, rows, 2)),
+                                 today - timedelta(days=7))
+    finally:
+        screening.close_database()
+
+class MemoryFarm:
+    """Preloaded farm, breeding and pig_records databases in shared memory, for tests and benchmarks.
+
+    Pass farm, breeding or records to any app class in place of a file path. The data lives until close().
+    """
+
+    def __init__(self, rows=FIXTURE_ROWS, seed=1, today=None):
+        name = f"memory_farm_{os.getpid()}_{next(fixture_numbers)}"
+        self.farm = shared_memory_storage(f"{name}_farm")
+        self.breeding = shared_memory_storage(f"{name}_breeding")
+        self.records = shared_memory_storage(f"{name}_records")
+
+        # A shared in-memory database is dropped when its last connection closes
+        self.anchors = [storage.connect() for storage in (self.farm, self.breeding, self.records)]
+        seed_databases(self.farm, self.breeding, self.records, rows, seed, today)
+
+    def close(self):
+        for conn in self.anchors:
+            conn.close()
+        self.anchors = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,103 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Constants
+LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pig_farm.log')
+LOG_LEVEL = logging.INFO
+LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotate once the log reaches 5 MB
+LOG_BACKUP_COUNT = 5
+LOG_FORMAT = ('%(asctime)s %(levelname)s %(module)s '
+              'operation=%(operation)s batch_number=%(batch_number)s duration=%(duration)s %(message)s')
+
+_listener = None
+_worker_queue = None
+_worker_listener = None
+
+class StructuredFieldsFilter(logging.Filter):
+    """Give every record the structured fields so the format string never fails."""
+
+    def filter(self, record):
+        for field in ('operation', 'batch_number', 'duration'):
+            if not hasattr(record, field):
+                setattr(record, field, '-')
+        return True
+
+def setup_logging(log_file=LOG_FILE, level=LOG_LEVEL, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+    """Route all logging through a queue to one background writer. Safe to call from every module."""
+    global _listener
+    if _listener is not None:
+        return _listener
+    if multiprocessing.parent_process() is not None:
+        # Pool workers send their records to the parent's writer through init_worker_logging
+        return None
+
+    # delay: the log file is only created once something is logged, not on import
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    file_handler.addFilter(StructuredFieldsFilter())
+
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(level)
+
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def worker_log_queue():
+    """Queue for process pool workers, drained into the log file by this process. Pass it to init_worker_logging."""
+    global _worker_queue, _worker_listener
+    if _worker_queue is None:
+        listener = setup_logging()
+        _worker_queue = multiprocessing.Queue()
+        _worker_listener = QueueListener(_worker_queue, *listener.handlers, respect_handler_level=True)
+        _worker_listener.start()
+    return _worker_queue
+
+def init_worker_logging(log_queue, level=LOG_LEVEL):
+    """Process pool initializer: send this worker's records to the parent's log writer."""
+    global _listener
+    # A forked worker inherits the parent's queue handler but not its writer thread, so replace it
+    _listener = None
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(level)
+
+def shutdown_logging():
+    """Flush queued records and stop the writer threads."""
+    global _listener, _worker_queue, _worker_listener
+    if _worker_listener is not None:
+        _worker_listener.stop()
+        _worker_listener = None
+        _worker_queue = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+@contextmanager
+def log_operation(operation, batch_number=None):
+    """Time a block and log it as one structured record. Error details stay with the caller's handler."""
+    started = time.perf_counter()
+    fields = {"operation": operation, "batch_number": batch_number if batch_number is not None else '-'}
+    try:
+        yield fields
+    except Exception:
+        fields["duration"] = f"{time.perf_counter() - started:.4f}"
+        logging.info(f"{operation} failed", extra=fields, stacklevel=3)
+        raise
+    fields["duration"] = f"{time.perf_counter() - started:.4f}"
+    logging.info(f"{operation} completed", extra=fields, stacklevel=3)
@@ -0,0 +1,57 @@
+import re
+
+# Farm rules shared by the Tk apps and the headless services; keep this module free of GUI imports
+
+# Constants
+DEFAULT_GESTATION_PERIOD = 144  # Default gestation period in days
+SLAUGHTER_AGE_THRESHOLD = 168  # Age threshold for slaughter
+
+# Feed bands: (start day, end day, feed description, expected weight gain per day)
+FEED_DATA = [
+    (1, 28, "breastfeeding", 0.21),
+    (29, 42, "0.00075kg of feed 2", 0.4),
+    (43, 56, "1kg of feed 2", 1.0),
+    (57, 70, "0.255kg of feed 2", 0.655),
+    (71, 85, "1.4kg of feed 3", 0.71),
+    (86, 99, "0.805kg of feed 3", 0.805),
+    (100, 114, "0.970kg of feed 3", 0.97),
+    (115, 128, "1.020kg of feed 3", 1.02),
+    (129, 143, "1.120kg of feed 4", 1.12),
+    (144, 157, "1.100kg of feed 4", 1.1),
+    (158, 240, "2.5kg of feed 4", "")
+]
+
+# Weight margin (kg) below the expected weight before a batch is considered critical
+CRITICAL_WEIGHT_MARGIN = 10
+
+def next_batch_number(last_batch_number):
+    # Example: A001, A002, ..., Z999
+    if last_batch_number:
+        prefix = chr(((ord(last_batch_number[0]) - ord('A') + 1) % 26) + ord('A'))
+        number = str(int(last_batch_number[1:]) + 1).zfill(3)
+    else:
+        # If no batches are registered yet
+        prefix = 'A'
+        number = '001'
+
+    return f"{prefix}{number}"
+
+def find_feed_band(age_in_days, feed_data=FEED_DATA):
+    for band in feed_data:
+        if band[0] <= age_in_days <= band[1]:
+            return band
+    return None
+
+def feed_ration(band):
+    """Return (feed type, kg per pig per day) for a feed band; breastfeeding uses no bought feed."""
+    match = re.match(r"([\d.]+)kg of (feed \d+)", band[2])
+    if match is None:
+        return None, 0.0
+    return match.group(2), float(match.group(1))
+
+def classify_health(actual_weight, expected_weight):
+    if actual_weight >= expected_weight:
+        return "Excellent"
+    if actual_weight < (expected_weight - CRITICAL_WEIGHT_MARGIN):
+        return "Critical"
+    return "Average"
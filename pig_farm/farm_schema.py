@@ -0,0 +1,53 @@
+# Table and index definitions for the farm and breeding databases, shared by the apps and the services
+
+def create_registration_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pig_registration (
+            id INTEGER PRIMARY KEY,
+            batch_number TEXT,
+            dob DATE,
+            males INTEGER,
+            females INTEGER,
+            mother_id TEXT
+        )
+    ''')
+    # Lookups by batch, and date-of-birth ranges for age cutoffs and the calendar
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pig_registration_batch ON pig_registration (batch_number)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pig_registration_dob ON pig_registration (dob)")
+
+def create_slaughter_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS slaughter_information (
+            id INTEGER PRIMARY KEY,
+            batch_number TEXT,
+            user_id TEXT,
+            males_slaughtered INTEGER,
+            females_slaughtered INTEGER,
+            avg_weight REAL,
+            date_slaughtered DATE
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_slaughter_information_batch ON slaughter_information (batch_number)")
+
+def create_breeding_table(cursor, schema='main'):
+    # schema is 'main' when the breeding database is opened directly, or the name it is attached under
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.pig_breeding (
+            id INTEGER PRIMARY KEY,
+            pig_id TEXT,
+            served_date DATE,
+            expected_birth_date DATE
+        )
+    ''')
+    # Deletes by pig ID, and the farrowing list ordered by expected birth date
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_pig_breeding_pig_id ON pig_breeding (pig_id)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_pig_breeding_expected_birth ON pig_breeding (expected_birth_date)")
+
+def create_farm_tables(cursor):
+    create_registration_table(cursor)
+    create_slaughter_table(cursor)
+
+def attach_breeding(conn, breeding_storage, schema='breeding'):
+    """Attach the breeding database to a farm connection and make sure its table exists."""
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (breeding_storage.uri,))
+    create_breeding_table(conn, schema)
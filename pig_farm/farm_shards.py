@@ -0,0 +1,189 @@
+import logging
+import os
+import sqlite3
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from farm_logging import setup_logging, init_worker_logging, worker_log_queue
+from farm_rules import SLAUGHTER_AGE_THRESHOLD, feed_ration, find_feed_band
+from farm_schema import create_breeding_table, create_farm_tables
+from storage import read_only_storage
+
+# Constants
+FARM_DATABASE_NAME = 'farm_database.db'
+BREEDING_DATABASE_NAME = 'pig_breeding.db'
+FARROWING_WINDOW_DAYS = 7
+FEED_FORECAST_DAYS = 30
+
+# Setup logging
+setup_logging()
+
+class ShardQueryError(Exception):
+    """Raised when a query failed on some farms, so a report never silently leaves a site out."""
+
+    def __init__(self, query_name, failures, results):
+        super().__init__(f"{query_name} failed on farms: " + ", ".join(f"{farm_id} ({error})" for farm_id, error in failures.items()))
+        self.failures = failures
+        # Results from the farms that did answer
+        self.results = results
+
+def open_read_only(db_path):
+    # A missing file is an error, not an empty farm; mode=ro never creates it
+    return read_only_storage(db_path).connect()
+
+# Per-shard queries. These run in worker processes, so they take plain paths and return plain data.
+
+def shard_slaughter_eligible(farm_id, farm_dir, today):
+    db_path = os.path.join(farm_dir, FARM_DATABASE_NAME)
+    cutoff = str(today - timedelta(days=SLAUGHTER_AGE_THRESHOLD))
+    conn = open_read_only(db_path)
+    try:
+        batches, males, females = conn.execute('''
+            SELECT COUNT(*), COALESCE(SUM(males), 0), COALESCE(SUM(females), 0)
+            FROM pig_registration WHERE dob <= ? AND males + females > 0
+        ''', (cutoff,)).fetchone()
+        return farm_id, {"batches": batches, "males": males, "females": females}
+    finally:
+        conn.close()
+
+def shard_farrowings_due(farm_id, farm_dir, today, days):
+    db_path = os.path.join(farm_dir, BREEDING_DATABASE_NAME)
+    conn = open_read_only(db_path)
+    try:
+        rows = conn.execute('''
+            SELECT pig_id, served_date, expected_birth_date FROM pig_breeding
+            WHERE expected_birth_date BETWEEN ? AND ?
+            ORDER BY expected_birth_date
+        ''', (str(today), str(today + timedelta(days=days)))).fetchall()
+        return farm_id, rows
+    finally:
+        conn.close()
+
+def shard_feed_forecast(farm_id, farm_dir, today, days):
+    db_path = os.path.join(farm_dir, FARM_DATABASE_NAME)
+    conn = open_read_only(db_path)
+    try:
+        # Batches born on the same day move through the feed bands together
+        ages = conn.execute('''
+            SELECT CAST(julianday(?) - julianday(dob) AS INTEGER) AS age, SUM(males + females)
+            FROM pig_registration GROUP BY dob
+        ''', (str(today),)).fetchall()
+    finally:
+        conn.close()
+
+    feed_kg = Counter()
+    for age, pigs in ages:
+        # Undated batches have no age, so no feed band to forecast from
+        if age is None or not pigs:
+            continue
+        for day in range(days):
+            band = find_feed_band(age + day)
+            if band:
+                feed_type, kg = feed_ration(band)
+                if feed_type:
+                    feed_kg[feed_type] += pigs * kg
+    return farm_id, dict(feed_kg)
+
+class ShardedFarms:
+    """One directory per farm under a common root, each with its own SQLite files."""
+
+    def __init__(self, root, max_workers=None):
+        self.root = root
+        self.max_workers = max_workers
+        # Started on the first report and kept, so later reports skip the worker start-up
+        self.executor = None
+        os.makedirs(root, exist_ok=True)
+
+    def farm_ids(self):
+        return sorted(entry.name for entry in os.scandir(self.root) if entry.is_dir())
+
+    def farm_dir(self, farm_id):
+        return os.path.join(self.root, farm_id)
+
+    def database_path(self, farm_id, database_name=FARM_DATABASE_NAME):
+        return os.path.join(self.farm_dir(farm_id), database_name)
+
+    def add_farm(self, farm_id):
+        os.makedirs(self.farm_dir(farm_id), exist_ok=True)
+        # Same tables as the apps create, so every shard can be opened by them
+        for database_name, create_tables in ((FARM_DATABASE_NAME, create_farm_tables),
+                                             (BREEDING_DATABASE_NAME, create_breeding_table)):
+            conn = self.connect(farm_id, database_name)
+            try:
+                create_tables(conn)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def connect(self, farm_id, database_name=FARM_DATABASE_NAME):
+        """Writable connection to one farm's database; writes never touch other shards."""
+        return sqlite3.connect(self.database_path(farm_id, database_name))
+
+    def fan_out(self, shard_query, *args):
+        """Run shard_query on every farm at once; raises ShardQueryError if any farm fails."""
+        farm_ids = self.farm_ids()
+        if not farm_ids:
+            return {}
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_worker_logging,
+                                                initargs=(worker_log_queue(),))
+        futures = {farm_id: self.executor.submit(shard_query, farm_id, self.farm_dir(farm_id), *args) for farm_id in farm_ids}
+        results = {}
+        failures = {}
+        for farm_id, future in futures.items():
+            try:
+                _, results[farm_id] = future.result()
+            except Exception as e:
+                logging.error(f"Error running {shard_query.__name__} on farm {farm_id}: {e}")
+                failures[farm_id] = str(e)
+        if failures:
+            raise ShardQueryError(shard_query.__name__, failures, results)
+        return results
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def total_slaughter_eligible(self, today=None):
+        today = today or datetime.now().date()
+        per_farm = self.fan_out(shard_slaughter_eligible, today)
+        totals = Counter()
+        for counts in per_farm.values():
+            totals.update(counts)
+        return {"total": dict(totals), "farms": per_farm}
+
+    def farrowings_due(self, today=None, days=FARROWING_WINDOW_DAYS):
+        today = today or datetime.now().date()
+        per_farm = self.fan_out(shard_farrowings_due, today, days)
+        merged = [(farm_id, *row) for farm_id, rows in per_farm.items() for row in rows]
+        merged.sort(key=lambda row: row[3])
+        return merged
+
+    def feed_forecast(self, today=None, days=FEED_FORECAST_DAYS):
+        """Kg of each feed type needed over the coming period, summed over all farms."""
+        today = today or datetime.now().date()
+        per_farm = self.fan_out(shard_feed_forecast, today, days)
+        totals = Counter()
+        for feed_kg in per_farm.values():
+            totals.update(feed_kg)
+        return {"total": dict(totals), "farms": per_farm}
+
+if __name__ == "__main__":
+    with ShardedFarms(sys.argv[1] if len(sys.argv) > 1 else 'farms') as sharded_farms:
+        try:
+            print("Slaughter eligible:", sharded_farms.total_slaughter_eligible()["total"])
+            for farm_id, pig_id, served_date, expected_birth_date in sharded_farms.farrowings_due():
+                print(f"{farm_id}\t{pig_id}\t{served_date}\t{expected_birth_date}")
+            print("Feed forecast (kg):", sharded_farms.feed_forecast()["total"])
+        except ShardQueryError as e:
+            print(f"Report incomplete: {e}")
+            sys.exit(1)
@@ -0,0 +1,311 @@
+import json
+import logging
+import sqlite3
+import sys
+import uuid
+from datetime import datetime
+
+from farm_logging import setup_logging, log_operation
+
+# Constants
+TRACKED_TABLES = ('pig_registration', 'slaughter_information', 'pig_breeding')
+
+# Setup logging
+setup_logging()
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def enable_change_capture(conn, node_id=None):
+    """Create the change log and triggers for every tracked table present in this database."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            row_data TEXT,
+            changed_at TEXT NOT NULL DEFAULT (datetime('now')),
+            origin TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_row ON change_log (table_name, row_key, seq)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_node (
+            node_id TEXT NOT NULL
+        )
+    ''')
+    # Local ids differ between copies, so rows are matched across copies by a key that is unique everywhere
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_rows (
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            row_key TEXT NOT NULL,
+            PRIMARY KEY (table_name, row_id)
+        )
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_rows_key ON sync_rows (table_name, row_key)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_peers (
+            peer_id TEXT PRIMARY KEY,
+            last_sent_seq INTEGER NOT NULL DEFAULT 0,
+            last_received_seq INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sync_conflicts (
+            id INTEGER PRIMARY KEY,
+            peer_id TEXT,
+            table_name TEXT,
+            row_key TEXT,
+            remote_operation TEXT,
+            remote_data TEXT,
+            detected_at TEXT NOT NULL DEFAULT (datetime('now')),
+            resolved_at TEXT,
+            resolution TEXT
+        )
+    ''')
+    if conn.execute("SELECT COUNT(*) FROM sync_node").fetchone()[0] == 0:
+        conn.execute("INSERT INTO sync_node (node_id) VALUES (?)", (node_id or uuid.uuid4().hex,))
+
+    existing_tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for table in TRACKED_TABLES:
+        if table not in existing_tables:
+            continue
+        # Rows from before change capture are shared history between copies, so their key is the same on every copy
+        conn.execute(f"INSERT OR IGNORE INTO sync_rows (table_name, row_id, row_key) SELECT '{table}', id, 'base:' || id FROM {table}")
+        row_json = "json_object(" + ", ".join(f"'{column}', NEW.{column}" for column in table_columns(conn, table)) + ")"
+        # New local rows are keyed by this node; rows applied from a peer already have their key mapped
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_insert_capture
+            AFTER INSERT ON {table}
+            BEGIN
+                INSERT OR IGNORE INTO sync_rows (table_name, row_id, row_key)
+                VALUES ('{table}', NEW.id, (SELECT node_id FROM sync_node) || ':' || NEW.id);
+                INSERT INTO change_log (table_name, row_key, operation, row_data)
+                VALUES ('{table}', (SELECT row_key FROM sync_rows WHERE table_name='{table}' AND row_id=NEW.id), 'insert', {row_json});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_update_capture
+            AFTER UPDATE ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_key, operation, row_data)
+                VALUES ('{table}', (SELECT row_key FROM sync_rows WHERE table_name='{table}' AND row_id=NEW.id), 'update', {row_json});
+            END
+        ''')
+        # The mapping goes with the row, so a reused id gets a fresh key
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_delete_capture
+            AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_key, operation, row_data)
+                VALUES ('{table}', (SELECT row_key FROM sync_rows WHERE table_name='{table}' AND row_id=OLD.id), 'delete', NULL);
+                DELETE FROM sync_rows WHERE table_name='{table}' AND row_id=OLD.id;
+            END
+        ''')
+    conn.commit()
+
+def node_id(conn):
+    return conn.execute("SELECT node_id FROM sync_node").fetchone()[0]
+
+def assign_new_node_id(conn):
+    """Give a copied database file its own identity so it can sync with the original."""
+    conn.execute("UPDATE sync_node SET node_id=?", (uuid.uuid4().hex,))
+    conn.execute("DELETE FROM sync_peers")
+    conn.commit()
+
+def peer_state(conn, peer_id):
+    conn.execute("INSERT OR IGNORE INTO sync_peers (peer_id) VALUES (?)", (peer_id,))
+    return conn.execute("SELECT last_sent_seq, last_received_seq FROM sync_peers WHERE peer_id=?", (peer_id,)).fetchone()
+
+def export_changes(conn, peer_id):
+    """Package every change the peer has not acknowledged, leaving out changes that came from it."""
+    last_sent_seq, last_received_seq = peer_state(conn, peer_id)
+    changes = [
+        {"seq": seq, "table": table, "row_key": row_key, "operation": operation,
+         "row": json.loads(row_data) if row_data else None}
+        for seq, table, row_key, operation, row_data in conn.execute('''
+            SELECT seq, table_name, row_key, operation, row_data FROM change_log
+            WHERE seq > ? AND (origin IS NULL OR origin != ?)
+            ORDER BY seq
+        ''', (last_sent_seq, peer_id))
+    ]
+    head_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+    conn.commit()
+    # "ack" tells the peer how far we have applied its own changes
+    return {"node_id": node_id(conn), "head_seq": head_seq, "ack": last_received_seq, "changes": changes}
+
+def local_row_id(conn, table, row_key):
+    row = conn.execute("SELECT row_id FROM sync_rows WHERE table_name=? AND row_key=?", (table, row_key)).fetchone()
+    return row[0] if row else None
+
+def apply_row_change(conn, change):
+    table = change["table"]
+    row_id = local_row_id(conn, table, change["row_key"])
+    if change["operation"] == 'delete':
+        if row_id is not None:
+            conn.execute(f"DELETE FROM {table} WHERE id=?", (row_id,))
+        return
+
+    # The peer's own id means nothing here; the row keeps or gets a local one
+    columns = [column for column in table_columns(conn, table) if column in change["row"] and column != 'id']
+    values = [change["row"][column] for column in columns]
+    if row_id is not None:
+        conn.execute(f"UPDATE {table} SET {', '.join(f'{column}=?' for column in columns)} WHERE id=?", (*values, row_id))
+        return
+    row_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+    conn.execute("INSERT INTO sync_rows (table_name, row_id, row_key) VALUES (?, ?, ?)", (table, row_id, change["row_key"]))
+    conn.execute(f"INSERT INTO {table} (id, {', '.join(columns)}) VALUES (?, {', '.join('?' for _ in columns)})",
+                 (row_id, *values))
+
+def matches_local_row(conn, change):
+    """True when this copy already holds what the change would leave behind."""
+    table = change["table"]
+    row_id = local_row_id(conn, table, change["row_key"])
+    if change["operation"] == 'delete' or row_id is None:
+        return change["operation"] == 'delete' and row_id is None
+    row = dict(zip(table_columns(conn, table), conn.execute(f"SELECT * FROM {table} WHERE id=?", (row_id,)).fetchone()))
+    return all(row[column] == value for column, value in change["row"].items() if column in row and column != 'id')
+
+def settle_conflicts(conn, peer_id, change, resolution):
+    conn.execute("UPDATE sync_conflicts SET resolved_at=datetime('now'), resolution=? "
+                 "WHERE peer_id=? AND table_name=? AND row_key=? AND resolved_at IS NULL",
+                 (resolution, peer_id, change["table"], change["row_key"]))
+
+def apply_from_peer(conn, peer_id, change):
+    seq_before = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+    apply_row_change(conn, change)
+    # Tag the rows our triggers just logged so they are not echoed back to the peer
+    conn.execute("UPDATE change_log SET origin=? WHERE seq > ?", (peer_id, seq_before))
+    # A clean change for a conflicted row is the peer's resolution arriving
+    settle_conflicts(conn, peer_id, change, 'peer')
+
+def import_changes(conn, package):
+    """Apply a peer's package. Rows changed on both sides since the last sync are recorded as conflicts."""
+    peer_id = package["node_id"]
+    last_sent_seq, last_received_seq = peer_state(conn, peer_id)
+    applied = 0
+    conflicts = 0
+
+    with log_operation("import_changes"):
+        try:
+            for change in package["changes"]:
+                if change["seq"] <= last_received_seq:
+                    continue
+
+                # A local change to the same row that the peer has not seen yet is a conflict
+                local_change = conn.execute('''
+                    SELECT 1 FROM change_log
+                    WHERE table_name=? AND row_key=? AND seq > ? AND (origin IS NULL OR origin != ?)
+                    LIMIT 1
+                ''', (change["table"], change["row_key"], last_sent_seq, peer_id)).fetchone()
+                if local_change and matches_local_row(conn, change):
+                    # Both sides already agree, e.g. the same resolution was made on each
+                    settle_conflicts(conn, peer_id, change, 'same')
+                    continue
+                if local_change:
+                    # Kept until resolve_conflict decides which side wins; the peer will not send it again
+                    conn.execute("INSERT INTO sync_conflicts (peer_id, table_name, row_key, remote_operation, remote_data) "
+                                 "VALUES (?, ?, ?, ?, ?)",
+                                 (peer_id, change["table"], change["row_key"], change["operation"],
+                                  json.dumps(change["row"]) if change["row"] else None))
+                    conflicts += 1
+                    continue
+
+                apply_from_peer(conn, peer_id, change)
+                applied += 1
+
+            conn.execute("UPDATE sync_peers SET last_received_seq=?, last_sent_seq=MAX(last_sent_seq, ?) WHERE peer_id=?",
+                         (max(package["head_seq"], last_received_seq), package["ack"], peer_id))
+            conn.commit()
+
+        except (sqlite3.Error, KeyError) as e:
+            conn.rollback()
+            logging.error(f"Error importing changes from {peer_id}: {e}")
+            raise
+
+    return {"applied": applied, "conflicts": conflicts}
+
+def open_conflicts(conn):
+    """Conflicts still waiting for resolve_conflict, oldest first."""
+    cursor = conn.execute("SELECT id, peer_id, table_name, row_key, remote_operation, remote_data, detected_at "
+                          "FROM sync_conflicts WHERE resolved_at IS NULL ORDER BY id")
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+def resolve_conflict(conn, conflict_id, keep):
+    """Settle a conflict by keeping the 'local' or the 'remote' version of the row.
+
+    Either way the outcome is logged as a new local change, so the next sync brings the peer to the same row
+    and closes its side of the conflict. Resolving on one copy is enough.
+    """
+    if keep not in ('local', 'remote'):
+        raise ValueError("keep must be 'local' or 'remote'")
+    conflict = conn.execute("SELECT table_name, row_key, remote_operation, remote_data FROM sync_conflicts "
+                            "WHERE id=? AND resolved_at IS NULL", (conflict_id,)).fetchone()
+    if conflict is None:
+        raise ValueError(f"No open conflict {conflict_id}")
+    table, row_key, remote_operation, remote_data = conflict
+
+    try:
+        if keep == 'remote':
+            apply_row_change(conn, {"table": table, "row_key": row_key, "operation": remote_operation,
+                                    "row": json.loads(remote_data) if remote_data else None})
+        else:
+            row_id = local_row_id(conn, table, row_key)
+            row = conn.execute(f"SELECT * FROM {table} WHERE id=?", (row_id,)).fetchone() if row_id is not None else None
+            row_data = json.dumps(dict(zip(table_columns(conn, table), row))) if row else None
+            conn.execute("INSERT INTO change_log (table_name, row_key, operation, row_data) VALUES (?, ?, ?, ?)",
+                         (table, row_key, 'update' if row else 'delete', row_data))
+        conn.execute("UPDATE sync_conflicts SET resolved_at=datetime('now'), resolution=? WHERE id=?", (keep, conflict_id))
+        conn.commit()
+
+    except sqlite3.Error as e:
+        conn.rollback()
+        logging.error(f"Error resolving sync conflict {conflict_id}: {e}")
+        raise
+
+def acknowledge(conn, peer_id, seq):
+    """Record that the peer has applied our changes up to seq."""
+    peer_state(conn, peer_id)
+    conn.execute("UPDATE sync_peers SET last_sent_seq=MAX(last_sent_seq, ?) WHERE peer_id=?", (seq, peer_id))
+    conn.commit()
+
+def sync_databases(local_path, remote_path):
+    """Two-way sync between two copies of the same database, exchanging only unacknowledged changes."""
+    local_conn = sqlite3.connect(local_path)
+    remote_conn = sqlite3.connect(remote_path)
+    try:
+        enable_change_capture(local_conn)
+        enable_change_capture(remote_conn)
+        local_id = node_id(local_conn)
+        remote_id = node_id(remote_conn)
+
+        outgoing = export_changes(local_conn, remote_id)
+        incoming = export_changes(remote_conn, local_id)
+        pushed = import_changes(remote_conn, outgoing)
+        pulled = import_changes(local_conn, incoming)
+
+        # Both sides have applied what they were sent
+        acknowledge(local_conn, remote_id, outgoing["head_seq"])
+        acknowledge(remote_conn, local_id, incoming["head_seq"])
+        return {"pushed": pushed, "pulled": pulled}
+    finally:
+        local_conn.close()
+        remote_conn.close()
+
+def write_package(package, path):
+    with open(path, 'w') as package_file:
+        json.dump(package, package_file)
+
+def read_package(path):
+    with open(path) as package_file:
+        return json.load(package_file)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python farm_sync.py <local database> <remote database>")
+        sys.exit(1)
+    started = datetime.now()
+    print(sync_databases(sys.argv[1], sys.argv[2]), f"in {(datetime.now() - started).total_seconds():.2f}s")
@@ -0,0 +1,191 @@
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+
+from farm_logging import setup_logging, log_operation
+from farm_rules import FEED_DATA, feed_ration
+from storage import FARM_DATABASE, resolve_storage
+
+# Constants
+FEED_TYPES = sorted({feed_type for feed_type, _ in map(feed_ration, FEED_DATA) if feed_type})
+MAX_FEED_AGE = FEED_DATA[-1][1]  # Batches older than the last band are no longer fed from the schedule
+CONSUMPTION_AVERAGE_DAYS = 7  # Days of rollups averaged for the days-of-stock estimate
+
+# Setup logging
+setup_logging()
+
+class FeedInventory:
+    def __init__(self, db_path=None):
+        self.conn, self.cursor = self.initialize_database(db_path)
+        self.load_feed_schedule()
+
+    def initialize_database(self, db_path):
+        try:
+            conn = resolve_storage(db_path, FARM_DATABASE).connect()
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS feed_deliveries (
+                    id INTEGER PRIMARY KEY,
+                    feed_type TEXT NOT NULL,
+                    delivered_on DATE NOT NULL,
+                    quantity_kg REAL NOT NULL,
+                    supplier TEXT
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_feed_deliveries_type_date ON feed_deliveries (feed_type, delivered_on)")
+
+            # Materialized consumption per feed type per day, only ever appended for days after that type's rollup
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS feed_consumption_daily (
+                    day DATE NOT NULL,
+                    feed_type TEXT NOT NULL,
+                    consumed_kg REAL NOT NULL,
+                    pigs INTEGER NOT NULL,
+                    PRIMARY KEY (feed_type, day)
+                ) WITHOUT ROWID
+            ''')
+
+            # Running totals so the stock screen never sums the history
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS feed_stock (
+                    feed_type TEXT PRIMARY KEY,
+                    delivered_kg REAL NOT NULL DEFAULT 0,
+                    consumed_kg REAL NOT NULL DEFAULT 0,
+                    rolled_up_to DATE
+                )
+            ''')
+            cursor.executemany("INSERT OR IGNORE INTO feed_stock (feed_type) VALUES (?)", [(feed_type,) for feed_type in FEED_TYPES])
+
+            conn.commit()
+            return conn, cursor
+
+        except sqlite3.Error as e:
+            logging.error(f"Error initializing feed inventory: {e}")
+            return None, None
+
+    def load_feed_schedule(self):
+        # Ration per pig for every age, so consumption for all batches is a single join
+        self.cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS feed_schedule (
+                age INTEGER PRIMARY KEY,
+                feed_type TEXT,
+                kg_per_pig REAL
+            )
+        ''')
+        self.cursor.execute("DELETE FROM feed_schedule")
+        schedule = []
+        for band in FEED_DATA:
+            feed_type, kg_per_pig = feed_ration(band)
+            if feed_type:
+                schedule.extend((age, feed_type, kg_per_pig) for age in range(band[0], band[1] + 1))
+        self.cursor.executemany("INSERT INTO feed_schedule (age, feed_type, kg_per_pig) VALUES (?, ?, ?)", schedule)
+        self.conn.commit()
+
+    def record_delivery(self, feed_type, quantity_kg, delivered_on=None, supplier=None):
+        if feed_type not in FEED_TYPES:
+            logging.error(f"Unknown feed type for delivery: {feed_type}")
+            return False
+        delivered_on = delivered_on or datetime.now().date()
+        try:
+            with log_operation("record_feed_delivery"):
+                self.cursor.execute("INSERT INTO feed_deliveries (feed_type, delivered_on, quantity_kg, supplier) VALUES (?, ?, ?, ?)",
+                                    (feed_type, str(delivered_on), quantity_kg, supplier))
+                self.cursor.execute("UPDATE feed_stock SET delivered_kg = delivered_kg + ? WHERE feed_type=?", (quantity_kg, feed_type))
+                # Stock tracking starts the day before the first delivery
+                self.cursor.execute('''
+                    UPDATE feed_stock SET rolled_up_to = date(?, '-1 day')
+                    WHERE rolled_up_to IS NULL
+                ''', (str(delivered_on),))
+                self.conn.commit()
+            return True
+
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logging.error(f"Error recording feed delivery: {e}")
+            return False
+
+    def roll_up(self, through=None):
+        """Materialize consumption for every day after each feed type's last rollup up to `through` (default yesterday).
+
+        Returns the number of days rolled up for the feed type furthest behind.
+        """
+        through = str(through or datetime.now().date() - timedelta(days=1))
+        with log_operation("roll_up_feed_consumption"):
+            try:
+                # Each feed type resumes from its own rolled_up_to, so a type added later never repeats days the
+                # others already have
+                last_day = self.cursor.execute("SELECT MIN(rolled_up_to) FROM feed_stock WHERE rolled_up_to < ?",
+                                               (through,)).fetchone()[0]
+                if last_day is None:
+                    return 0
+
+                # Per batch per day, ration by age times live headcount; batches found by the dob index
+                self.cursor.execute('''
+                    WITH RECURSIVE days(day) AS (
+                        SELECT date(:last_day, '+1 day')
+                        UNION ALL
+                        SELECT date(day, '+1 day') FROM days WHERE day < :through
+                    )
+                    INSERT INTO feed_consumption_daily (day, feed_type, consumed_kg, pigs)
+                    SELECT days.day, s.feed_type, SUM(s.kg_per_pig * (r.males + r.females)), SUM(r.males + r.females)
+                    FROM days
+                    JOIN pig_registration r ON r.dob BETWEEN date(days.day, :max_age) AND days.day
+                    JOIN feed_schedule s ON s.age = CAST(julianday(days.day) - julianday(r.dob) AS INTEGER)
+                    JOIN feed_stock st ON st.feed_type = s.feed_type AND days.day > st.rolled_up_to
+                    WHERE r.males + r.females > 0
+                    GROUP BY days.day, s.feed_type
+                ''', {"last_day": last_day, "through": through, "max_age": f"-{MAX_FEED_AGE} days"})
+
+                self.cursor.execute('''
+                    UPDATE feed_stock SET
+                        consumed_kg = consumed_kg + COALESCE((
+                            SELECT SUM(consumed_kg) FROM feed_consumption_daily c
+                            WHERE c.feed_type = feed_stock.feed_type AND c.day > feed_stock.rolled_up_to AND c.day <= :through
+                        ), 0),
+                        rolled_up_to = :through
+                    WHERE rolled_up_to < :through
+                ''', {"through": through})
+                self.conn.commit()
+                return (datetime.strptime(through, '%Y-%m-%d') - datetime.strptime(last_day, '%Y-%m-%d')).days
+
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                logging.error(f"Error rolling up feed consumption: {e}")
+                return 0
+
+    def get_daily_consumption(self, feed_type, start, end):
+        self.cursor.execute('''
+            SELECT day, consumed_kg, pigs FROM feed_consumption_daily
+            WHERE feed_type = ? AND day BETWEEN ? AND ? ORDER BY day
+        ''', (feed_type, str(start), str(end)))
+        return self.cursor.fetchall()
+
+    def days_of_stock(self, average_days=CONSUMPTION_AVERAGE_DAYS):
+        """(feed type, stock kg, average daily kg, days remaining) from the running totals and the latest rollups."""
+        self.cursor.execute('''
+            SELECT st.feed_type,
+                   st.delivered_kg - st.consumed_kg AS stock_kg,
+                   COALESCE((
+                       SELECT SUM(c.consumed_kg) FROM feed_consumption_daily c
+                       WHERE c.feed_type = st.feed_type AND c.day > date(st.rolled_up_to, :window)
+                   ), 0) / :average_days AS daily_kg
+            FROM feed_stock st
+            ORDER BY st.feed_type
+        ''', {"window": f"-{average_days} days", "average_days": average_days})
+        return [(feed_type, stock_kg, daily_kg, max(stock_kg, 0) / daily_kg if daily_kg else None)
+                for feed_type, stock_kg, daily_kg in self.cursor.fetchall()]
+
+    def close_database(self):
+        if self.conn:
+            self.conn.close()
+
+if __name__ == "__main__":
+    feed_inventory = FeedInventory()
+    try:
+        feed_inventory.roll_up()
+        for feed_type, stock_kg, daily_kg, days_remaining in feed_inventory.days_of_stock():
+            remaining = f"{days_remaining:.1f} days" if days_remaining is not None else "no recent use"
+            print(f"{feed_type}: {stock_kg:.1f}kg in stock, {daily_kg:.1f}kg/day, {remaining}")
+    finally:
+        feed_inventory.close_database()
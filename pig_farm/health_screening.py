@@ -0,0 +1,142 @@
+import logging
+import sqlite3
+from datetime import datetime
+
+from farm_logging import setup_logging
+from farm_rules import FEED_DATA, CRITICAL_WEIGHT_MARGIN
+from storage import FARM_DATABASE, resolve_storage
+
+# Constants
+FINISHER_DAILY_GAIN = 2.0  # Midpoint of the 1.5-2.5 kg/day range used for the last feed band
+MAX_CURVE_AGE = FEED_DATA[-1][1]  # Expected weight stays flat after the last feed band
+
+# Setup logging
+setup_logging()
+
+def build_expected_weight_curve(feed_data=FEED_DATA, finisher_daily_gain=FINISHER_DAILY_GAIN):
+    """Return a list where index N is the expected weight of a pig aged N days."""
+    curve = [0.0] * (MAX_CURVE_AGE + 1)
+    daily_gain = [0.0] * (MAX_CURVE_AGE + 1)
+    for start_day, end_day, _, weight_gain_per_day in feed_data:
+        gain = weight_gain_per_day if isinstance(weight_gain_per_day, float) else finisher_daily_gain
+        for day in range(max(start_day, 1), min(end_day, MAX_CURVE_AGE) + 1):
+            daily_gain[day] = gain
+
+    # Prefix sum so each age is a single lookup
+    for day in range(1, MAX_CURVE_AGE + 1):
+        curve[day] = curve[day - 1] + daily_gain[day]
+    return [round(weight, 3) for weight in curve]
+
+class HealthScreening:
+    def __init__(self, db_path=None):
+        self.conn, self.cursor = self.initialize_database(db_path)
+        self.load_expected_weight_curve()
+
+    def initialize_database(self, db_path):
+        try:
+            conn = resolve_storage(db_path, FARM_DATABASE).connect()
+            cursor = conn.cursor()
+
+            # Weigh-in results, one row per batch per weigh day
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS batch_weights (
+                    id INTEGER PRIMARY KEY,
+                    batch_number TEXT,
+                    weigh_date DATE,
+                    avg_weight REAL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_batch_weights_batch_date
+                ON batch_weights (batch_number, weigh_date)
+            ''')
+
+            conn.commit()
+            return conn, cursor
+
+        except sqlite3.Error as e:
+            # Nothing here works without the tables, so fail now rather than on the first query
+            logging.error(f"Error initializing database: {e}")
+            raise
+
+    def load_expected_weight_curve(self):
+        # Keep the growth curve in a temp table so the whole herd is classified in one query
+        self.cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS expected_growth (
+                age INTEGER PRIMARY KEY,
+                expected_weight REAL
+            )
+        ''')
+        self.cursor.execute("DELETE FROM expected_growth")
+        self.cursor.executemany("INSERT INTO expected_growth (age, expected_weight) VALUES (?, ?)",
+                                enumerate(build_expected_weight_curve()))
+        self.conn.commit()
+
+    def record_weights(self, weights, weigh_date=None):
+        """Store (batch_number, avg_weight) pairs from a weigh-in day."""
+        weigh_date = weigh_date or datetime.now().date()
+        try:
+            self.cursor.executemany("INSERT INTO batch_weights (batch_number, weigh_date, avg_weight) VALUES (?, ?, ?)",
+                                    ((batch_number, weigh_date, avg_weight) for batch_number, avg_weight in weights))
+            self.conn.commit()
+            return True
+
+        except sqlite3.Error as e:
+            logging.error(f"Error recording weights: {e}")
+            return False
+
+    def screen_herd(self, today=None):
+        """Classify every batch with pigs by its latest weigh-in up to today.
+
+        Returns (batch_number, age at weigh-in, expected, actual, deficit, status) rows.
+        """
+        today = today or datetime.now().date()
+        try:
+            # Each batch seeks its latest weigh-in on the index instead of grouping every weigh-in.
+            # Age is taken on the weigh day so the expected weight matches the weigh-in.
+            self.cursor.execute('''
+                WITH aged AS (
+                    SELECT r.batch_number,
+                           CAST(julianday(w.weigh_date) - julianday(r.dob) AS INTEGER) AS age,
+                           w.avg_weight
+                    FROM pig_registration r
+                    JOIN batch_weights w ON w.id = (
+                        SELECT id FROM batch_weights
+                        WHERE batch_number = r.batch_number AND weigh_date <= :today
+                        ORDER BY weigh_date DESC, id DESC LIMIT 1
+                    )
+                    WHERE r.males + r.females > 0
+                )
+                SELECT aged.batch_number, aged.age, g.expected_weight, aged.avg_weight,
+                       ROUND(g.expected_weight - aged.avg_weight, 3) AS deficit,
+                       CASE
+                           WHEN aged.avg_weight >= g.expected_weight THEN 'Excellent'
+                           WHEN aged.avg_weight < g.expected_weight - :margin THEN 'Critical'
+                           ELSE 'Average'
+                       END AS health_status
+                FROM aged
+                JOIN expected_growth g ON g.age = MIN(MAX(aged.age, 0), :max_age)
+                ORDER BY deficit DESC
+            ''', {"today": str(today), "margin": CRITICAL_WEIGHT_MARGIN, "max_age": MAX_CURVE_AGE})
+            return self.cursor.fetchall()
+
+        except sqlite3.Error as e:
+            logging.error(f"Error screening herd health: {e}")
+            return []
+
+    def get_underperformers(self, today=None, limit=None):
+        """Return batches below their expected weight, worst deficit first."""
+        underperformers = [row for row in self.screen_herd(today) if row[5] != "Excellent"]
+        return underperformers[:limit] if limit else underperformers
+
+    def close_database(self):
+        if self.conn:
+            self.conn.close()
+
+if __name__ == "__main__":
+    screening = HealthScreening()
+    try:
+        for batch_number, age, expected_weight, actual_weight, deficit, health_status in screening.get_underperformers():
+            print(f"{batch_number}\t{age}\t{expected_weight}\t{actual_weight}\t{deficit}\t{health_status}")
+    finally:
+        screening.close_database()
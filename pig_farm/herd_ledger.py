@@ -0,0 +1,205 @@
+import logging
+import sqlite3
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from farm_logging import setup_logging, log_operation
+from storage import FARM_DATABASE, resolve_storage
+
+# Setup logging
+setup_logging()
+
+class HerdLedger:
+    """Registrations and slaughters as a dated ledger with running headcount totals per day.
+
+    pig_registration only keeps current counts, so a batch's registered count is its current count plus
+    everything slaughtered from it; the slaughters then come off on their own dates.
+    """
+
+    def __init__(self, db_path=None):
+        self.conn, self.cursor = self.initialize_database(db_path)
+
+    def initialize_database(self, db_path):
+        try:
+            conn = resolve_storage(db_path, FARM_DATABASE).connect()
+            cursor = conn.cursor()
+
+            # One row per day with any movement; the totals are the headcount at the end of that day
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS headcount_ledger (
+                    event_date DATE PRIMARY KEY,
+                    males_delta INTEGER NOT NULL DEFAULT 0,
+                    females_delta INTEGER NOT NULL DEFAULT 0,
+                    males_total INTEGER NOT NULL DEFAULT 0,
+                    females_total INTEGER NOT NULL DEFAULT 0
+                ) WITHOUT ROWID
+            ''')
+            # Highest source row id already folded into the ledger
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS headcount_ledger_sources (
+                    source TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL
+                )
+            ''')
+            for table in ('pig_registration', 'slaughter_information'):
+                cursor.execute("INSERT OR IGNORE INTO headcount_ledger_sources (source, last_id) VALUES (?, 0)", (table,))
+
+            conn.commit()
+            return conn, cursor
+
+        except sqlite3.Error as e:
+            logging.error(f"Error initializing headcount ledger: {e}")
+            return None, None
+
+    def last_id(self, source):
+        return self.cursor.execute("SELECT last_id FROM headcount_ledger_sources WHERE source=?", (source,)).fetchone()[0]
+
+    def collect_new_events(self):
+        """Per-day (males, females) deltas from rows added since the last refresh, plus the new high-water marks."""
+        deltas = defaultdict(lambda: [0, 0])
+        skipped = 0
+        last_registration_id = self.last_id('pig_registration')
+        last_slaughter_id = self.last_id('slaughter_information')
+        slaughter_head = self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM slaughter_information").fetchone()[0]
+        registration_head = self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM pig_registration").fetchone()[0]
+
+        # Registered count = current count + every slaughter up to the head we fold in now
+        self.cursor.execute('''
+            SELECT date(r.dob),
+                   CAST(COALESCE(r.males, 0) AS INTEGER) + COALESCE(SUM(s.males_slaughtered), 0),
+                   CAST(COALESCE(r.females, 0) AS INTEGER) + COALESCE(SUM(s.females_slaughtered), 0)
+            FROM pig_registration r
+            LEFT JOIN slaughter_information s ON s.batch_number = r.batch_number AND s.id <= ?
+            WHERE r.id > ? AND r.id <= ?
+            GROUP BY r.id
+        ''', (slaughter_head, last_registration_id, registration_head))
+        for event_date, males, females in self.cursor.fetchall():
+            if event_date is None:
+                skipped += 1
+                continue
+            deltas[event_date][0] += males
+            deltas[event_date][1] += females
+
+        self.cursor.execute('''
+            SELECT date(date_slaughtered), SUM(males_slaughtered), SUM(females_slaughtered)
+            FROM slaughter_information
+            WHERE id > ? AND id <= ?
+            GROUP BY date(date_slaughtered)
+        ''', (last_slaughter_id, slaughter_head))
+        for event_date, males, females in self.cursor.fetchall():
+            if event_date is None:
+                skipped += 1
+                continue
+            deltas[event_date][0] -= males or 0
+            deltas[event_date][1] -= females or 0
+
+        if skipped:
+            logging.warning(f"Skipped events with unreadable dates while refreshing the headcount ledger: {skipped}")
+        return deltas, registration_head, slaughter_head
+
+    def refresh(self):
+        """Fold new registrations and slaughters into the ledger, recomputing totals only from the earliest changed day."""
+        with log_operation("refresh_headcount_ledger"):
+            try:
+                deltas, registration_head, slaughter_head = self.collect_new_events()
+                if deltas:
+                    self.cursor.executemany('''
+                        INSERT INTO headcount_ledger (event_date, males_delta, females_delta) VALUES (?, ?, ?)
+                        ON CONFLICT(event_date) DO UPDATE SET
+                            males_delta = males_delta + excluded.males_delta,
+                            females_delta = females_delta + excluded.females_delta
+                    ''', [(event_date, males, females) for event_date, (males, females) in deltas.items()])
+                    self.recompute_totals(min(deltas))
+
+                self.cursor.execute("UPDATE headcount_ledger_sources SET last_id=? WHERE source='pig_registration'", (registration_head,))
+                self.cursor.execute("UPDATE headcount_ledger_sources SET last_id=? WHERE source='slaughter_information'", (slaughter_head,))
+                self.conn.commit()
+                return len(deltas)
+
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                logging.error(f"Error refreshing headcount ledger: {e}")
+                return 0
+
+    def recompute_totals(self, from_date):
+        # Running sums from from_date onwards, on top of the totals at the end of the previous day
+        base_males, base_females = self.headcount_as_of_day_before(from_date)
+        self.cursor.execute('''
+            UPDATE headcount_ledger
+            SET males_total = running.males_total, females_total = running.females_total
+            FROM (
+                SELECT event_date,
+                       ? + SUM(males_delta) OVER (ORDER BY event_date) AS males_total,
+                       ? + SUM(females_delta) OVER (ORDER BY event_date) AS females_total
+                FROM headcount_ledger
+                WHERE event_date >= ?
+            ) AS running
+            WHERE headcount_ledger.event_date = running.event_date
+        ''', (base_males, base_females, from_date))
+
+    def headcount_as_of_day_before(self, day):
+        row = self.cursor.execute('''
+            SELECT males_total, females_total FROM headcount_ledger
+            WHERE event_date < ? ORDER BY event_date DESC LIMIT 1
+        ''', (str(day),)).fetchone()
+        return row or (0, 0)
+
+    def headcount_as_of(self, day=None):
+        """(males, females) on hand at the end of the given day."""
+        day = day or datetime.now().date()
+        if isinstance(day, str):
+            day = datetime.strptime(day, '%Y-%m-%d').date()
+        return self.headcount_as_of_day_before(day + timedelta(days=1))
+
+    def iter_headcount_series(self, start, end):
+        """Yield (date, males, females) for every day from start to end inclusive."""
+        males, females = self.headcount_as_of_day_before(start)
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT event_date, males_total, females_total FROM headcount_ledger
+            WHERE event_date BETWEEN ? AND ? ORDER BY event_date
+        ''', (str(start), str(end)))
+        changes = iter(cursor)
+        change = next(changes, None)
+        day = start
+        while day <= end:
+            if change and change[0] == str(day):
+                _, males, females = change
+                change = next(changes, None)
+            yield day, males, females
+            day += timedelta(days=1)
+        cursor.close()
+
+    def reconcile(self):
+        """Compare today's ledger total with the live counts; a difference means counts were overwritten directly."""
+        ledger_males, ledger_females = self.headcount_as_of_day_before(date.max)
+        live_males, live_females = self.cursor.execute('''
+            SELECT COALESCE(SUM(CAST(males AS INTEGER)), 0), COALESCE(SUM(CAST(females AS INTEGER)), 0)
+            FROM pig_registration WHERE date(dob) IS NOT NULL
+        ''').fetchone()
+        drift = (live_males - ledger_males, live_females - ledger_females)
+        if drift != (0, 0):
+            logging.warning(f"Headcount ledger differs from live counts by {drift[0]} males and {drift[1]} females")
+        return drift
+
+    def rebuild(self):
+        try:
+            self.cursor.execute("DELETE FROM headcount_ledger")
+            self.cursor.execute("UPDATE headcount_ledger_sources SET last_id=0")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error clearing headcount ledger: {e}")
+        return self.refresh()
+
+    def close_database(self):
+        if self.conn:
+            self.conn.close()
+
+if __name__ == "__main__":
+    herd_ledger = HerdLedger()
+    try:
+        herd_ledger.refresh()
+        males, females = herd_ledger.headcount_as_of()
+        print(f"On hand today: {males} males, {females} females")
+    finally:
+        herd_ledger.close_database()
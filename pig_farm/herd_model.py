@@ -0,0 +1,161 @@
+from array import array
+from datetime import datetime
+
+# Columns stored in typed array buffers instead of Python lists
+NUMERIC_COLUMNS = ('males', 'females', 'age')
+
+# Rows pulled per fetchmany call when streaming
+CHUNK_SIZE = 500
+
+# Age in days computed by SQLite, so no per-row strptime in Python
+AGE_EXPRESSION = "CAST(julianday(?) - julianday(dob) AS INTEGER)"
+
+def iter_chunks(cursor, chunk_size=CHUNK_SIZE, cancel_event=None):
+    """Yield lists of up to chunk_size rows until the cursor runs out or cancel_event is set.
+
+    Closing the generator early also closes the cursor.
+    """
+    try:
+        while cancel_event is None or not cancel_event.is_set():
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+def iter_rows(cursor, chunk_size=CHUNK_SIZE, cancel_event=None):
+    for rows in iter_chunks(cursor, chunk_size, cancel_event):
+        yield from rows
+
+def to_count(value):
+    # Counts entered through the forms can arrive as text or be left empty; those give None, not 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def select_registrations(cursor, where="", params=(), today=None):
+    today = today or datetime.now().date()
+    cursor.execute(f"SELECT batch_number, dob, males, females, mother_id, {AGE_EXPRESSION} AS age "
+                   f"FROM pig_registration {where} ORDER BY id", (str(today), *params))
+    return cursor
+
+class BatchRecord:
+    """A single pig_registration row."""
+
+    __slots__ = ('batch_number', 'dob', 'males', 'females', 'mother_id', 'age')
+
+    def __init__(self, batch_number, dob=None, males=0, females=0, mother_id=None, age=None):
+        self.batch_number = batch_number
+        self.dob = dob
+        self.males = males
+        self.females = females
+        self.mother_id = mother_id
+        self.age = age
+
+    @property
+    def total(self):
+        return sum(count for count in (self.males, self.females) if isinstance(count, int))
+
+    def __repr__(self):
+        return (f"BatchRecord(batch_number={self.batch_number!r}, dob={self.dob!r}, males={self.males}, "
+                f"females={self.females}, mother_id={self.mother_id!r}, age={self.age})")
+
+class HerdFrame:
+    """Column-oriented set of batches. Counts and ages live in array('q') buffers.
+
+    Iterating, or indexing by position, gives row tuples in column order, so a frame can stand in for a list of rows.
+
+    A column holding a blank, NULL or non-numeric value falls back to a list that keeps the value as read.
+    """
+
+    __slots__ = ('columns', 'data')
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.data = {column: array('q') if column in NUMERIC_COLUMNS else [] for column in self.columns}
+
+    @classmethod
+    def from_cursor(cls, cursor):
+        """Build a frame straight from an executed cursor, one row at a time."""
+        frame = cls(column[0] for column in cursor.description)
+        frame.extend(cursor)
+        return frame
+
+    @classmethod
+    def iter_frames(cls, cursor, chunk_size=CHUNK_SIZE, cancel_event=None):
+        """Yield one frame per fetchmany chunk so consumers can start on the first rows."""
+        columns = [column[0] for column in cursor.description]
+        for rows in iter_chunks(cursor, chunk_size, cancel_event):
+            frame = cls(columns)
+            frame.extend(rows)
+            yield frame
+
+    @classmethod
+    def from_registrations(cls, cursor, where="", params=(), today=None):
+        select_registrations(cursor, where, params, today)
+        return cls.from_cursor(cursor)
+
+    def extend(self, rows):
+        columns = [(column, column in NUMERIC_COLUMNS) for column in self.columns]
+        data = self.data
+        for row in rows:
+            for (column, numeric), value in zip(columns, row):
+                target = data[column]
+                if numeric:
+                    count = to_count(value)
+                    if count is not None:
+                        value = count
+                    elif isinstance(target, array):
+                        target = data[column] = list(target)
+                target.append(value)
+
+    def __len__(self):
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, key):
+        # A column name gives the column; a position or slice gives row tuples
+        if isinstance(key, str):
+            return self.data[key]
+        if isinstance(key, slice):
+            return list(self.rows())[key]
+        return tuple(self.data[column][key] for column in self.columns)
+
+    def __iter__(self):
+        return self.rows()
+
+    def record(self, index):
+        return BatchRecord(**{column: self.data[column][index] for column in self.columns
+                              if column in BatchRecord.__slots__})
+
+    def records(self):
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def rows(self, *columns):
+        """Yield tuples of the requested columns without storing them."""
+        return zip(*(self.data[column] for column in (columns or self.columns)))
+
+    def total(self, column):
+        # Values that are not counts are shown but not added up
+        return sum(value for value in self.data[column] if isinstance(value, int))
+
+    def select(self, indices):
+        """Return a new frame holding only the given row positions."""
+        frame = HerdFrame(self.columns)
+        for column in self.columns:
+            source = self.data[column]
+            target = frame.data[column] = array('q') if isinstance(source, array) else []
+            for index in indices:
+                target.append(source[index])
+        return frame
+
+    def find(self, column, value):
+        try:
+            return self.data[column].index(value)
+        except ValueError:
+            return None
@@ -0,0 +1,310 @@
+import logging
+import math
+import os
+import random
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from operator import add
+
+from farm_logging import setup_logging, log_operation, init_worker_logging, worker_log_queue
+from farm_rules import DEFAULT_GESTATION_PERIOD, FEED_DATA, SLAUGHTER_AGE_THRESHOLD, feed_ration
+from lineage import normalize_sow_id
+from storage import BREEDING_DATABASE, FARM_DATABASE, resolve_storage
+
+# Constants
+SIMULATION_DAYS = 365
+DEFAULT_SCENARIOS = 1000
+ESTRUS_CYCLE_DAYS = 21  # An open sow comes into heat roughly every 21 days
+WEANING_AGE = FEED_DATA[0][1]  # Piglets leave the sow at the end of the breastfeeding band
+DEFAULT_LITTER_SIZE = 10.0
+DEFAULT_LITTER_SD = 2.5
+CONCEPTION_RATE_RANGE = (0.75, 0.90)
+PRE_WEANING_MORTALITY_RANGE = (0.08, 0.15)  # Share of piglets lost before weaning
+POST_WEANING_MORTALITY_RANGE = (0.02, 0.05)  # Share of weaners lost before slaughter
+
+# Age bands used for pen occupancy and feed: the feed bands that start before slaughter age
+BAND_STARTS = [start_day for start_day, _, _, _ in FEED_DATA if start_day < SLAUGHTER_AGE_THRESHOLD]
+BAND_NAMES = [f"{start_day}-{end_day}" for start_day, end_day, _, _ in FEED_DATA[:len(BAND_STARTS)]]
+BAND_RATIONS = [feed_ration(band) for band in FEED_DATA[:len(BAND_STARTS)]]
+FEED_TYPES = sorted({feed_type for feed_type, _ in BAND_RATIONS if feed_type})
+
+# Setup logging
+setup_logging()
+
+def band_for_age(age):
+    band = 0
+    for index, start_day in enumerate(BAND_STARTS):
+        if max(age, 1) >= start_day:
+            band = index
+    return band
+
+def load_herd_state(farm_db_path=None, breeding_db_path=None, today=None):
+    """Read the starting herd: growers by age, sows in gestation and the observed litter sizes."""
+    today = today or datetime.now().date()
+    growers = [0] * SLAUGHTER_AGE_THRESHOLD
+    ready_for_slaughter = 0
+    litter_sizes = []
+    sows = set()
+
+    farm_conn = resolve_storage(farm_db_path, FARM_DATABASE).as_read_only().connect()
+    try:
+        for age, pigs in farm_conn.execute('''
+            SELECT CAST(julianday(?) - julianday(dob) AS INTEGER) AS age, SUM(males + females)
+            FROM pig_registration WHERE dob IS NOT NULL GROUP BY age
+        ''', (str(today),)):
+            if age is None or age < 0 or not pigs:
+                continue
+            if age >= SLAUGHTER_AGE_THRESHOLD:
+                ready_for_slaughter += pigs
+            else:
+                growers[age] += pigs
+
+        # Litter sizes from batches that still have their mother recorded
+        for (litter_size,) in farm_conn.execute('''
+            SELECT r.males + r.females + COALESCE(SUM(s.males_slaughtered + s.females_slaughtered), 0)
+            FROM pig_registration r
+            LEFT JOIN slaughter_information s ON s.batch_number = r.batch_number
+            WHERE r.mother_id IS NOT NULL AND r.mother_id != ''
+            GROUP BY r.id
+        '''):
+            litter_sizes.append(litter_size)
+        # Sows are counted by normalized ID, as in lineage, so 'S7' and 's-007' are one sow
+        sows.update(normalize_sow_id(mother_id) for (mother_id,) in farm_conn.execute(
+            "SELECT DISTINCT mother_id FROM pig_registration WHERE mother_id IS NOT NULL AND mother_id != ''"))
+    finally:
+        farm_conn.close()
+
+    gestation = [0] * DEFAULT_GESTATION_PERIOD
+    breeding_conn = resolve_storage(breeding_db_path, BREEDING_DATABASE).as_read_only().connect()
+    try:
+        for pig_id, days_left in breeding_conn.execute('''
+            SELECT pig_id, CAST(julianday(expected_birth_date) - julianday(?) AS INTEGER)
+            FROM pig_breeding WHERE expected_birth_date >= ?
+        ''', (str(today), str(today))):
+            sows.add(normalize_sow_id(pig_id))
+            gestation[min(days_left, DEFAULT_GESTATION_PERIOD - 1)] += 1
+        sows.update(normalize_sow_id(pig_id) for (pig_id,) in breeding_conn.execute("SELECT DISTINCT pig_id FROM pig_breeding"))
+    finally:
+        breeding_conn.close()
+    sows.discard(None)
+
+    if litter_sizes:
+        litter_mean = sum(litter_sizes) / len(litter_sizes)
+        litter_sd = math.sqrt(sum((size - litter_mean) ** 2 for size in litter_sizes) / len(litter_sizes)) or DEFAULT_LITTER_SD
+    else:
+        litter_mean, litter_sd = DEFAULT_LITTER_SIZE, DEFAULT_LITTER_SD
+
+    return {
+        "growers": growers,
+        "ready_for_slaughter": ready_for_slaughter,
+        "gestation": gestation,
+        "open_sows": max(len(sows) - sum(gestation), 0),
+        "litter_mean": litter_mean,
+        "litter_sd": litter_sd,
+    }
+
+def sample_binomial(rng, trials, probability):
+    if trials <= 0 or probability <= 0:
+        return 0
+    if probability >= 1:
+        return trials
+    if probability > 0.5:
+        return trials - sample_binomial(rng, trials, 1 - probability)
+
+    mean = trials * probability
+    if mean >= 50:
+        # Normal approximation keeps large sow groups O(1)
+        draw = round(rng.gauss(mean, math.sqrt(mean * (1 - probability))))
+        return min(max(draw, 0), trials)
+
+    # Jump geometrically from one success to the next: cost follows successes, not trials
+    log_failure = math.log(1 - probability)
+    successes = 0
+    position = 0
+    while True:
+        position += int(math.log(1 - rng.random()) / log_failure) + 1
+        if position > trials:
+            return successes
+        successes += 1
+
+def new_totals(days):
+    return {
+        "sows_served": [0] * days,
+        "farrowings": [0] * days,
+        "piglets_born": [0] * days,
+        "slaughtered": [0.0] * days,
+        # occupancy[day][band]
+        "occupancy": [[0.0] * len(BAND_STARTS) for _ in range(days)],
+    }
+
+def feed_by_type(band_pigs):
+    """Convert pigs (or pig-days) per band into kg per feed type."""
+    feed = {feed_type: 0.0 for feed_type in FEED_TYPES}
+    for pigs, (feed_type, kg) in zip(band_pigs, BAND_RATIONS):
+        if feed_type:
+            feed[feed_type] += pigs * kg
+    return feed
+
+def simulate_scenarios(state, scenarios, days, seed):
+    """Run a block of scenarios; returns summed daily series and per-scenario yearly totals.
+
+    Sow events and litter sizes are drawn per day; grower losses use each scenario's
+    sampled mortality rates as expected fractions so a day costs O(bands), not O(pigs).
+    """
+    totals = new_totals(days)
+    yearly = {"slaughtered": [], "farrowings": [], "peak_occupancy": [],
+              "feed": {feed_type: [] for feed_type in FEED_TYPES}}
+    band_count = len(BAND_STARTS)
+    cohort_length = SLAUGHTER_AGE_THRESHOLD
+    litter_mean = state["litter_mean"]
+    litter_sd = state["litter_sd"]
+    occupancy = totals["occupancy"]
+    starting_bands = [0.0] * band_count
+    for age, pigs in enumerate(state["growers"]):
+        starting_bands[band_for_age(age)] += pigs
+
+    for scenario in range(scenarios):
+        rng = random.Random(seed + scenario)
+        conception_rate = rng.uniform(*CONCEPTION_RATE_RANGE)
+        pre_weaning_survival = 1 - rng.uniform(*PRE_WEANING_MORTALITY_RANGE)
+        # Post-weaning losses are taken in equal shares at each later band change
+        post_weaning_survival = (1 - rng.uniform(*POST_WEANING_MORTALITY_RANGE)) ** (1 / max(band_count - 2, 1))
+        transitions = [(band, BAND_STARTS[band], pre_weaning_survival if band == 1 else post_weaning_survival)
+                       for band in range(1, band_count)]
+
+        # Growers live in a ring indexed by age; band totals only change at band starts
+        cohorts = [float(pigs) for pigs in state["growers"]]
+        head = 0
+        band_totals = list(starting_bands)
+        pig_days = [0.0] * band_count
+
+        gestation = deque(state["gestation"])
+        lactation = deque([0] * WEANING_AGE)
+        open_sows = state["open_sows"]
+        backlog = state["ready_for_slaughter"]
+
+        scenario_slaughtered = 0.0
+        scenario_farrowings = 0
+        scenario_peak = 0.0
+
+        for day in range(days):
+            # Sows: service, conception, farrowing and weaning
+            served = sample_binomial(rng, open_sows, 1 / ESTRUS_CYCLE_DAYS)
+            conceived = sample_binomial(rng, served, conception_rate)
+            open_sows -= conceived
+            farrowings = gestation.popleft()
+            gestation.append(conceived)
+            open_sows += lactation.popleft()
+            lactation.append(farrowings)
+
+            piglets = 0
+            if farrowings:
+                piglets = max(round(rng.gauss(farrowings * litter_mean, math.sqrt(farrowings) * litter_sd)), 0)
+
+            # Growers age one day: the oldest cohort goes to slaughter, newborns take its slot
+            head = (head - 1) % cohort_length
+            slaughtered = cohorts[head] + backlog
+            backlog = 0
+            band_totals[-1] -= cohorts[head]
+            cohorts[head] = piglets
+            band_totals[0] += piglets
+
+            for band, start_day, survival in transitions:
+                position = (head + start_day) % cohort_length
+                moving = cohorts[position]
+                if moving:
+                    survivors = moving * survival
+                    cohorts[position] = survivors
+                    band_totals[band - 1] -= moving
+                    band_totals[band] += survivors
+
+            on_hand = sum(band_totals)
+            if on_hand > scenario_peak:
+                scenario_peak = on_hand
+            scenario_slaughtered += slaughtered
+            scenario_farrowings += farrowings
+
+            totals["sows_served"][day] += served
+            totals["farrowings"][day] += farrowings
+            totals["piglets_born"][day] += piglets
+            totals["slaughtered"][day] += slaughtered
+            occupancy[day] = list(map(add, occupancy[day], band_totals))
+            pig_days = list(map(add, pig_days, band_totals))
+
+        yearly["slaughtered"].append(round(scenario_slaughtered))
+        yearly["farrowings"].append(scenario_farrowings)
+        yearly["peak_occupancy"].append(round(scenario_peak))
+        for feed_type, kg in feed_by_type(pig_days).items():
+            yearly["feed"][feed_type].append(round(kg, 3))
+
+    return totals, yearly
+
+def merge_results(results, days):
+    totals = new_totals(days)
+    yearly = {"slaughtered": [], "farrowings": [], "peak_occupancy": [],
+              "feed": {feed_type: [] for feed_type in FEED_TYPES}}
+    for block_totals, block_yearly in results:
+        for metric in ("sows_served", "farrowings", "piglets_born", "slaughtered"):
+            totals[metric] = [a + b for a, b in zip(totals[metric], block_totals[metric])]
+        totals["occupancy"] = [list(map(add, a, b)) for a, b in zip(totals["occupancy"], block_totals["occupancy"])]
+        for feed_type in FEED_TYPES:
+            yearly["feed"][feed_type].extend(block_yearly["feed"][feed_type])
+        for metric in ("slaughtered", "farrowings", "peak_occupancy"):
+            yearly[metric].extend(block_yearly[metric])
+    return totals, yearly
+
+def percentiles(values, points=(10, 50, 90)):
+    ordered = sorted(values)
+    if not ordered:
+        return {f"p{point}": 0 for point in points}
+    return {f"p{point}": ordered[min(int(len(ordered) * point / 100), len(ordered) - 1)] for point in points}
+
+def run_simulation(state, scenarios=DEFAULT_SCENARIOS, days=SIMULATION_DAYS, workers=None, seed=None):
+    """Project the herd day by day across many random scenarios, split over worker processes."""
+    if scenarios < 1:
+        raise ValueError(f"scenarios must be at least 1, got {scenarios}")
+    workers = workers or os.cpu_count() or 1
+    seed = random.randrange(2 ** 31) if seed is None else seed
+    block_size = math.ceil(scenarios / workers)
+    blocks = [(start, min(block_size, scenarios - start)) for start in range(0, scenarios, block_size)]
+
+    with log_operation("run_simulation"):
+        if len(blocks) == 1:
+            results = [simulate_scenarios(state, scenarios, days, seed)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_logging,
+                                     initargs=(worker_log_queue(),)) as executor:
+                futures = [executor.submit(simulate_scenarios, state, count, days, seed + start) for start, count in blocks]
+                results = [future.result() for future in futures]
+
+    totals, yearly = merge_results(results, days)
+    daily_mean = {metric: [value / scenarios for value in totals[metric]]
+                  for metric in ("sows_served", "farrowings", "piglets_born", "slaughtered")}
+    mean_occupancy = [[pigs / scenarios for pigs in day_bands] for day_bands in totals["occupancy"]]
+    daily_mean["occupancy"] = {BAND_NAMES[band]: [day_bands[band] for day_bands in mean_occupancy]
+                               for band in range(len(BAND_STARTS))}
+    daily_feed = [feed_by_type(day_bands) for day_bands in mean_occupancy]
+    daily_mean["feed_kg"] = {feed_type: [day_feed[feed_type] for day_feed in daily_feed] for feed_type in FEED_TYPES}
+
+    return {
+        "scenarios": scenarios,
+        "days": days,
+        "daily_mean": daily_mean,
+        "yearly": {
+            "slaughtered": percentiles(yearly["slaughtered"]),
+            "farrowings": percentiles(yearly["farrowings"]),
+            "peak_occupancy": percentiles(yearly["peak_occupancy"]),
+            "feed_kg": {feed_type: percentiles(values) for feed_type, values in yearly["feed"].items()},
+        },
+    }
+
+if __name__ == "__main__":
+    try:
+        simulation = run_simulation(load_herd_state())
+        for metric, bands in simulation["yearly"].items():
+            print(metric, bands)
+    except sqlite3.Error as e:
+        logging.error(f"Error running herd simulation: {e}")
+        print("Failed to run the simulation. Please check the logs.")
@@ -0,0 +1,245 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from farm_logging import setup_logging, log_operation, init_worker_logging, worker_log_queue
+from storage import BREEDING_DATABASE, FARM_DATABASE, RECORDS_DATABASE, resolve_storage
+
+# Constants
+RANGE_SIZE = 50_000  # Rowids per worker task
+
+# A text date column must round-trip through date(), which is what strptime('%Y-%m-%d') expects
+def bad_date(column):
+    return f"{column} IS NULL OR date({column}) IS NOT {column}"
+
+def bad_count(*columns):
+    return " OR ".join(f"typeof({column}) != 'integer' OR {column} < 0" for column in columns)
+
+# (check name, condition flagging a bad row, whether the row may be quarantined). Type and count checks only report:
+# the columns are loosely typed, and blank counts stay visible on purpose (see herd_model.to_count).
+TABLE_CHECKS = {
+    'pig_registration': [
+        ('batch_number_type', "typeof(batch_number) != 'text'", False),
+        ('bad_dob', bad_date('dob'), True),
+        ('bad_count', bad_count('males', 'females'), False),
+    ],
+    'slaughter_information': [
+        ('batch_number_type', "typeof(batch_number) != 'text'", False),
+        ('bad_date_slaughtered', bad_date('date_slaughtered'), True),
+        ('bad_count', bad_count('males_slaughtered', 'females_slaughtered'), False),
+        ('orphan_batch', "NOT EXISTS (SELECT 1 FROM pig_registration r "
+                         "WHERE r.batch_number = slaughter_information.batch_number)", True),
+    ],
+    'pig_breeding': [
+        ('bad_served_date', bad_date('served_date'), True),
+        ('bad_expected_birth_date', bad_date('expected_birth_date'), True),
+        ('birth_before_service', "expected_birth_date < served_date", True),
+    ],
+    'pig_records': [
+        ('batch_number_type', "typeof(batch_number) != 'integer'", False),
+        ('bad_date_born', bad_date('date_born'), True),
+        ('bad_count', bad_count('male_pigs', 'female_pigs'), False),
+    ],
+}
+
+# Tables whose rows refer to a registration by batch_number; a registration still referred to is never quarantined
+DEPENDENT_TABLES = {
+    'pig_registration': ('slaughter_information', 'batch_weights'),
+}
+
+# perform_reduction clamps at zero, so the only trace of an over-reduction is more pigs slaughtered than
+# were registered. The registered counts are only known where change capture (farm_sync) logged the insert.
+CLAMPED_REDUCTION_CHECK = ('clamped_reduction', '''
+    EXISTS (
+        SELECT 1 FROM sync_rows k JOIN change_log c ON c.table_name = k.table_name AND c.row_key = k.row_key
+        WHERE k.table_name = 'pig_registration' AND k.row_id = pig_registration.id AND c.operation = 'insert'
+          AND c.seq = (SELECT MIN(seq) FROM change_log WHERE table_name = 'pig_registration' AND row_key = k.row_key)
+          AND ((SELECT COALESCE(SUM(males_slaughtered), 0) FROM slaughter_information s
+                WHERE s.batch_number = pig_registration.batch_number) > json_extract(c.row_data, '$.males')
+               OR (SELECT COALESCE(SUM(females_slaughtered), 0) FROM slaughter_information s
+                   WHERE s.batch_number = pig_registration.batch_number) > json_extract(c.row_data, '$.females'))
+    )''', False)
+
+# Setup logging
+setup_logging()
+
+def scan_range(db_uri, table, checks, first_rowid, last_rowid):
+    """Scan one rowid range in a single pass; returns (rowid, [failed check names]) for bad rows only."""
+    # Workers get the read-only URI rather than a StorageBackend, like the farm_shards tasks get plain paths
+    conn = sqlite3.connect(db_uri, uri=True)
+    try:
+        flags = ", ".join(f"({condition})" for _, condition, _ in checks)
+        any_failed = " OR ".join(f"({condition})" for _, condition, _ in checks)
+        cursor = conn.execute(f"SELECT rowid, {flags} FROM {table} "
+                              f"WHERE rowid BETWEEN ? AND ? AND ({any_failed})", (first_rowid, last_rowid))
+        return [(row[0], [name for (name, _, _), failed in zip(checks, row[1:]) if failed]) for row in cursor]
+    finally:
+        conn.close()
+
+def has_dependent_rows(conn, table, dependents, rowid):
+    return any(conn.execute(f"SELECT 1 FROM {dependent} WHERE batch_number = "
+                            f"(SELECT batch_number FROM {table} WHERE rowid = ?) LIMIT 1", (rowid,)).fetchone()
+               for dependent in dependents)
+
+def create_quarantine_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quarantine (
+            id INTEGER PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            checks TEXT,
+            row_data TEXT,
+            quarantined_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    ''')
+
+class IntegrityScanner:
+    def __init__(self, farm_db_path=None, breeding_db_path=None, records_db_path=None, workers=None,
+                 range_size=RANGE_SIZE):
+        farm_storage = resolve_storage(farm_db_path, FARM_DATABASE)
+        self.table_databases = {
+            'pig_registration': farm_storage,
+            'slaughter_information': farm_storage,
+            'pig_breeding': resolve_storage(breeding_db_path, BREEDING_DATABASE),
+            'pig_records': resolve_storage(records_db_path, RECORDS_DATABASE),
+        }
+        self.workers = workers or os.cpu_count() or 1
+        self.range_size = range_size
+
+        # A private in-memory database is empty on every connect and would scan as clean. A shared one only lives in
+        # this process, so the worker processes can't open it.
+        for storage in set(self.table_databases.values()):
+            if storage.kind != 'memory':
+                continue
+            if storage.location is None:
+                raise ValueError("Integrity checks need a file or a shared in-memory database, not a private ':memory:' one")
+            if self.workers != 1:
+                raise ValueError(f"Shared in-memory database {storage.location} can only be scanned with workers=1")
+
+    def missing_databases(self):
+        """Database files that do not exist; scanning those would report a clean farm that was never checked."""
+        return sorted({storage.location for storage in self.table_databases.values()
+                       if storage.kind == 'file' and not os.path.exists(storage.location)})
+
+    def plan_tasks(self):
+        """Split every table present into rowid ranges, each paired with the checks that apply to it."""
+        tasks = []
+        for table, storage in self.table_databases.items():
+            # mode=ro never creates a file, so a missing database raises here instead of scanning as empty
+            db_uri = storage.as_read_only().uri
+            conn = sqlite3.connect(db_uri, uri=True)
+            try:
+                tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+                if table not in tables:
+                    continue
+                checks = list(TABLE_CHECKS[table])
+                if table == 'pig_registration' and {'change_log', 'sync_rows', 'slaughter_information'} <= tables:
+                    checks.append(CLAMPED_REDUCTION_CHECK)
+                if table == 'slaughter_information' and 'pig_registration' not in tables:
+                    checks = [check for check in checks if check[0] != 'orphan_batch']
+                first_rowid, last_rowid = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+            finally:
+                conn.close()
+
+            if first_rowid is None:
+                continue
+            for start in range(first_rowid, last_rowid + 1, self.range_size):
+                tasks.append((db_uri, table, tuple(checks), start, min(start + self.range_size - 1, last_rowid)))
+        return tasks
+
+    def scan(self):
+        """Return {table: [(rowid, [check names]), ...]} for every table with bad rows."""
+        tasks = self.plan_tasks()
+        findings = {}
+        with log_operation("integrity_scan"):
+            if self.workers == 1 or len(tasks) <= 1:
+                results = [scan_range(*task) for task in tasks]
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker_logging,
+                                         initargs=(worker_log_queue(),)) as executor:
+                    results = list(executor.map(scan_range, *zip(*tasks)))
+        for (_, table, _, _, _), bad_rows in zip(tasks, results):
+            if bad_rows:
+                findings.setdefault(table, []).extend(bad_rows)
+        return findings
+
+    def summarize(self, findings):
+        return {table: Counter(name for _, names in bad_rows for name in names) for table, bad_rows in findings.items()}
+
+    def quarantine(self, findings):
+        """Move quarantinable bad rows into a quarantine table in their own database. Returns rows moved."""
+        quarantinable = {table: {name for name, _, can_quarantine in TABLE_CHECKS[table] if can_quarantine}
+                         for table in TABLE_CHECKS}
+        moved = 0
+        for table, bad_rows in findings.items():
+            rows = [(rowid, names) for rowid, names in bad_rows if quarantinable[table].intersection(names)]
+            if not rows:
+                continue
+            conn = self.table_databases[table].connect()
+            try:
+                tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+                dependents = [dependent for dependent in DEPENDENT_TABLES.get(table, ()) if dependent in tables]
+                kept = {rowid for rowid, _ in rows if has_dependent_rows(conn, table, dependents, rowid)}
+                if kept:
+                    logging.warning(f"Not quarantining {len(kept)} rows from {table} that other rows still refer to")
+                    rows = [(rowid, names) for rowid, names in rows if rowid not in kept]
+                if not rows:
+                    continue
+
+                create_quarantine_table(conn)
+                columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                row_json = "json_object(" + ", ".join(f"'{column}', {column}" for column in columns) + ")"
+                with log_operation("quarantine_rows"):
+                    conn.executemany(f"INSERT INTO quarantine (table_name, row_id, checks, row_data) "
+                                     f"SELECT '{table}', rowid, ?, {row_json} FROM {table} WHERE rowid = ?",
+                                     [(json.dumps(names), rowid) for rowid, names in rows])
+                    conn.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(rowid,) for rowid, _ in rows])
+                    conn.commit()
+                moved += len(rows)
+
+            except sqlite3.Error as e:
+                conn.rollback()
+                logging.error(f"Error quarantining rows from {table}: {e}")
+            finally:
+                conn.close()
+        return moved
+
+    def preflight(self, quarantine=False):
+        """Scan before a nightly job; True when nothing needs attention."""
+        missing = self.missing_databases()
+        for db_path in missing:
+            logging.error(f"Integrity check failed: database {db_path} does not exist")
+        if missing:
+            return False
+
+        try:
+            findings = self.scan()
+        except sqlite3.Error as e:
+            logging.error(f"Integrity check failed: {e}")
+            return False
+        for table, counts in self.summarize(findings).items():
+            for name, count in counts.items():
+                logging.warning(f"Integrity check {name} failed for {count} rows in {table}")
+        if quarantine and findings:
+            logging.warning(f"Quarantined {self.quarantine(findings)} rows")
+        return not findings
+
+if __name__ == "__main__":
+    # Usage: python integrity_check.py [--quarantine]
+    scanner = IntegrityScanner()
+    missing = scanner.missing_databases()
+    for db_path in missing:
+        print(f"Missing database: {db_path}")
+    if missing:
+        sys.exit(1)
+    findings = scanner.scan()
+    for table, counts in scanner.summarize(findings).items():
+        for name, count in sorted(counts.items()):
+            print(f"{table}\t{name}\t{count}")
+    if '--quarantine' in sys.argv[1:]:
+        print(f"Quarantined {scanner.quarantine(findings)} rows")
+    sys.exit(1 if findings else 0)
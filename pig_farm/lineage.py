@@ -0,0 +1,278 @@
+import logging
+import re
+import sqlite3
+
+from farm_logging import setup_logging, log_operation
+from farm_schema import attach_breeding, create_farm_tables
+from storage import BREEDING_DATABASE, FARM_DATABASE, resolve_storage
+
+# Constants
+SOW_ID_PATTERN = re.compile(r'([A-Z]*)0*(\d+)')
+SOW_ID_SEPARATORS = str.maketrans('', '', ' \t\n-_')
+
+# Setup logging
+setup_logging()
+
+def normalize_sow_id(raw_id):
+    """Canonical sow ID: 's-07 ' and 'S7' both become 'S7', and the integer 7 from pig_records becomes '7'."""
+    if raw_id is None:
+        return None
+    text = str(raw_id).translate(SOW_ID_SEPARATORS).upper()
+    if not text:
+        return None
+    # Drop leading zeros from the numeric part so 'S007' and 'S7' match
+    match = SOW_ID_PATTERN.fullmatch(text)
+    return f"{match.group(1)}{match.group(2)}" if match else text
+
+class LineageIndex:
+    def __init__(self, db_path=None, breeding_db_path=None):
+        self.conn, self.cursor = self.initialize_database(db_path, breeding_db_path)
+
+    def initialize_database(self, db_path, breeding_db_path):
+        try:
+            # Makes sure the registration, slaughter and breeding tables exist and attaches breeding
+            conn = resolve_storage(db_path, FARM_DATABASE).connect()
+            create_farm_tables(conn)
+            attach_breeding(conn, resolve_storage(breeding_db_path, BREEDING_DATABASE))
+            conn.create_function('normalize_sow_id', 1, normalize_sow_id, deterministic=True)
+            cursor = conn.cursor()
+
+            # One row per registered litter, keyed to the normalized mother
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS litters (
+                    registration_id INTEGER PRIMARY KEY,
+                    batch_number TEXT,
+                    sow_key TEXT,
+                    dob DATE
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_litters_sow_dob ON litters (sow_key, dob)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_litters_batch ON litters (batch_number)")
+
+            # Every known sow, the breeding record she is served under and the litter she came from
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sows (
+                    sow_key TEXT PRIMARY KEY,
+                    breeding_pig_id TEXT,
+                    born_in_batch TEXT
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sows_born_in ON sows (born_in_batch)")
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sow_productivity (
+                    sow_key TEXT PRIMARY KEY,
+                    litters INTEGER,
+                    piglets_born INTEGER,
+                    piglets_slaughtered INTEGER,
+                    first_farrowing DATE,
+                    last_farrowing DATE,
+                    farrowing_interval REAL,
+                    piglets_per_litter REAL,
+                    slaughter_yield REAL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sow_productivity_rank
+                ON sow_productivity (piglets_per_litter DESC, litters)
+            ''')
+
+            # Highest slaughter row id already reflected in sow_productivity
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS lineage_sources (
+                    source TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute("INSERT OR IGNORE INTO lineage_sources (source, last_id) VALUES ('slaughter_information', 0)")
+
+            conn.commit()
+            return conn, cursor
+
+        except sqlite3.Error as e:
+            logging.error(f"Error initializing lineage tables: {e}")
+            return None, None
+
+    def refresh(self):
+        """Pick up registrations and slaughters added since the last refresh and recompute only the affected sows."""
+        with log_operation("refresh_lineage"):
+            try:
+                last_id = self.cursor.execute("SELECT COALESCE(MAX(registration_id), 0) FROM litters").fetchone()[0]
+                last_slaughter_id = self.cursor.execute(
+                    "SELECT last_id FROM lineage_sources WHERE source='slaughter_information'").fetchone()[0]
+                slaughter_head = self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM slaughter_information").fetchone()[0]
+                self.cursor.execute('''
+                    INSERT INTO litters (registration_id, batch_number, sow_key, dob)
+                    SELECT id, batch_number, normalize_sow_id(mother_id), dob
+                    FROM pig_registration WHERE id > ?
+                ''', (last_id,))
+                changed_sows = [row[0] for row in self.cursor.execute('''
+                    SELECT sow_key FROM litters WHERE registration_id > ? AND sow_key IS NOT NULL
+                    UNION
+                    SELECT l.sow_key FROM slaughter_information s JOIN litters l ON l.batch_number = s.batch_number
+                    WHERE s.id > ? AND l.sow_key IS NOT NULL
+                ''', (last_id, last_slaughter_id))]
+
+                # No DISTINCT: OR IGNORE drops repeats, and without it the planner ranges over the new litters
+                self.cursor.execute('''
+                    INSERT OR IGNORE INTO sows (sow_key)
+                    SELECT sow_key FROM litters WHERE registration_id > ? AND sow_key IS NOT NULL
+                ''', (last_id,))
+                self.link_breeding_records()
+                # On the first run every sow changed, so skip the IN list
+                self.refresh_productivity(changed_sows if last_id else None)
+                self.cursor.execute("UPDATE lineage_sources SET last_id=? WHERE source='slaughter_information'", (slaughter_head,))
+                self.conn.commit()
+                return len(changed_sows)
+
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                logging.error(f"Error refreshing lineage: {e}")
+                return 0
+
+    def rebuild(self):
+        """Drop and rebuild all lineage data, e.g. after mother IDs were corrected by hand."""
+        try:
+            self.cursor.execute("DELETE FROM litters")
+            self.cursor.execute("DELETE FROM sow_productivity")
+            self.cursor.execute("UPDATE sows SET breeding_pig_id = NULL")
+            self.cursor.execute("UPDATE lineage_sources SET last_id=0")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error clearing lineage data: {e}")
+        self.refresh()
+
+    def link_breeding_records(self):
+        self.cursor.execute('''
+            INSERT OR IGNORE INTO sows (sow_key)
+            SELECT DISTINCT normalize_sow_id(pig_id) FROM breeding.pig_breeding WHERE pig_id IS NOT NULL
+        ''')
+        # Normalize each breeding record once; the bare pig_id comes from the row with MAX(id), the latest one
+        self.cursor.execute('''
+            UPDATE sows SET breeding_pig_id = latest.pig_id
+            FROM (
+                SELECT normalize_sow_id(pig_id) AS sow_key, pig_id, MAX(id)
+                FROM breeding.pig_breeding WHERE pig_id IS NOT NULL
+                GROUP BY normalize_sow_id(pig_id)
+            ) AS latest
+            WHERE latest.sow_key = sows.sow_key AND sows.breeding_pig_id IS NULL
+        ''')
+
+    def record_birth_litter(self, sow_id, batch_number):
+        """Record which litter a sow was born in, which is what links generations together."""
+        try:
+            self.cursor.execute('''
+                INSERT INTO sows (sow_key, born_in_batch) VALUES (?, ?)
+                ON CONFLICT(sow_key) DO UPDATE SET born_in_batch = excluded.born_in_batch
+            ''', (normalize_sow_id(sow_id), batch_number))
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error recording birth litter of sow {sow_id}: {e}")
+            return False
+
+    def refresh_productivity(self, sow_keys=None):
+        where = ""
+        params = ()
+        if sow_keys is not None:
+            if not sow_keys:
+                return
+            where = f"WHERE l.sow_key IN ({', '.join('?' for _ in sow_keys)})"
+            params = tuple(sow_keys)
+
+        # Piglets born = current head count plus everything slaughtered from the batch
+        self.cursor.execute(f'''
+            INSERT OR REPLACE INTO sow_productivity
+                (sow_key, litters, piglets_born, piglets_slaughtered, first_farrowing, last_farrowing,
+                 farrowing_interval, piglets_per_litter, slaughter_yield)
+            SELECT sow_key, litters, born, slaughtered, first_dob, last_dob,
+                   CASE WHEN litters > 1 THEN (julianday(last_dob) - julianday(first_dob)) / (litters - 1) END,
+                   CAST(born AS REAL) / litters,
+                   CASE WHEN born > 0 THEN CAST(slaughtered AS REAL) / born END
+            FROM (
+                SELECT sow_key,
+                       COUNT(*) AS litters,
+                       SUM(on_hand + slaughtered) AS born,
+                       SUM(slaughtered) AS slaughtered,
+                       MIN(dob) AS first_dob,
+                       MAX(dob) AS last_dob
+                FROM (
+                    SELECT l.sow_key, l.dob,
+                           COALESCE(r.males, 0) + COALESCE(r.females, 0) AS on_hand,
+                           (SELECT COALESCE(SUM(males_slaughtered + females_slaughtered), 0)
+                            FROM slaughter_information s WHERE s.batch_number = l.batch_number) AS slaughtered
+                    FROM litters l
+                    JOIN pig_registration r ON r.id = l.registration_id
+                    {where}
+                )
+                GROUP BY sow_key
+            )
+            WHERE sow_key IS NOT NULL
+        ''', params)
+
+    def get_litters(self, sow_id):
+        self.cursor.execute('''
+            SELECT batch_number, dob FROM litters WHERE sow_key = ? ORDER BY dob
+        ''', (normalize_sow_id(sow_id),))
+        return self.cursor.fetchall()
+
+    def get_ancestors(self, sow_id, max_generations=20):
+        """Mother, grandmother, ... as (generation, sow_key, born_in_batch) rows."""
+        self.cursor.execute('''
+            WITH RECURSIVE ancestry(generation, sow_key, born_in_batch) AS (
+                SELECT 0, sow_key, born_in_batch FROM sows WHERE sow_key = ?
+                UNION ALL
+                SELECT ancestry.generation + 1, mother.sow_key, mother.born_in_batch
+                FROM ancestry
+                JOIN litters ON litters.batch_number = ancestry.born_in_batch
+                JOIN sows mother ON mother.sow_key = litters.sow_key
+                WHERE ancestry.generation < ?
+            )
+            SELECT generation, sow_key, born_in_batch FROM ancestry WHERE generation > 0 ORDER BY generation
+        ''', (normalize_sow_id(sow_id), max_generations))
+        return self.cursor.fetchall()
+
+    def get_descendant_sows(self, sow_id, max_generations=20):
+        """Daughters kept as sows, their daughters, ... as (generation, sow_key) rows."""
+        self.cursor.execute('''
+            WITH RECURSIVE descent(generation, sow_key) AS (
+                SELECT 0, ?
+                UNION ALL
+                SELECT descent.generation + 1, daughter.sow_key
+                FROM descent
+                JOIN litters ON litters.sow_key = descent.sow_key
+                JOIN sows daughter ON daughter.born_in_batch = litters.batch_number
+                WHERE descent.generation < ?
+            )
+            SELECT generation, sow_key FROM descent WHERE generation > 0 ORDER BY generation, sow_key
+        ''', (normalize_sow_id(sow_id), max_generations))
+        return self.cursor.fetchall()
+
+    def get_productivity(self, sow_id):
+        self.cursor.execute("SELECT * FROM sow_productivity WHERE sow_key = ?", (normalize_sow_id(sow_id),))
+        return self.cursor.fetchone()
+
+    def select_breeding_sows(self, min_litters=1, limit=20):
+        """Most productive sows by piglets per litter, from the precomputed figures."""
+        self.cursor.execute('''
+            SELECT p.sow_key, s.breeding_pig_id, p.litters, p.piglets_per_litter, p.farrowing_interval, p.slaughter_yield
+            FROM sow_productivity p
+            JOIN sows s ON s.sow_key = p.sow_key
+            WHERE p.litters >= ?
+            ORDER BY p.piglets_per_litter DESC
+            LIMIT ?
+        ''', (min_litters, limit))
+        return self.cursor.fetchall()
+
+    def close_database(self):
+        if self.conn:
+            self.conn.close()
+
+if __name__ == "__main__":
+    lineage_index = LineageIndex()
+    try:
+        lineage_index.refresh()
+        for sow_key, breeding_pig_id, litters, piglets_per_litter, farrowing_interval, slaughter_yield in lineage_index.select_breeding_sows():
+            print(f"{sow_key}\t{breeding_pig_id}\t{litters}\t{piglets_per_litter:.1f}\t{farrowing_interval}\t{slaughter_yield}")
+    finally:
+        lineage_index.close_database()
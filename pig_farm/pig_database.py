@@ -2,17 +2,18 @@
 import sqlite3
 from datetime import datetime
 
+from herd_model import CHUNK_SIZE, iter_chunks
+from storage import RECORDS_DATABASE, resolve_storage
+
 class PigDatabase:
     def __init__(self, db_path=None):
-        if db_path is None:
-            # Use the script directory to create the database file path
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            db_path = os.path.join(script_dir, 'pigfarm_database.db')
+        # A path, ':memory:', a 'file:' URI or a StorageBackend; defaults to the file next to this script
+        storage = resolve_storage(db_path, RECORDS_DATABASE)
 
         sqlite3.register_adapter(datetime.date, lambda x: x.strftime('%Y-%m-%d').encode('utf-8'))
         sqlite3.register_converter('DATE', lambda x: datetime.strptime(x.decode('utf-8'), '%Y-%m-%d').date())
 
-        self.conn = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+        self.conn = storage.connect(detect_types=sqlite3.PARSE_DECLTYPES)
         self.c = self.conn.cursor()
         self.create_table()
 
@@ -28,6 +29,7 @@ class PigDatabase:
                 age_in_days INTEGER
             )
         ''')
+        self.c.execute('CREATE INDEX IF NOT EXISTS idx_pig_records_batch ON pig_records (batch_number)')
         self.conn.commit()
 
     def add_record(self, batch_number, mother_id, date_born, male_pigs, female_pigs, age_in_days=None):
@@ -57,23 +59,23 @@ class PigDatabase:
             print(f"Failed to delete record. Error: {str(e)}")
 
     def get_all_records(self):
+        return [record for records in self.iter_records() for record in records]
+
+    def iter_records(self, chunk_size=CHUNK_SIZE, cancel_event=None):
         try:
-            self.c.execute('SELECT * FROM pig_records')
-            return self.c.fetchall()
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT * FROM pig_records')
+            yield from iter_chunks(cursor, chunk_size, cancel_event)
         except Exception as e:
             print(f"Failed to retrieve records. Error: {str(e)}")
-            return []
 
     def update_age_in_days(self):
         try:
-            records = self.get_all_records()
-            for record in records:
-                record_id, _, _, date_born, _, _, _ = record
-
-                if date_born is not None:
-                    date_of_birth = date_born
-                    age_in_days = (datetime.now().date() - date_of_birth).days
-                    self.c.execute('UPDATE pig_records SET age_in_days = ? WHERE id = ?', (age_in_days, record_id))
+            today = datetime.now().date()
+            for records in self.iter_records():
+                updates = [((today - date_born).days, record_id)
+                           for record_id, _, _, date_born, _, _, _ in records if date_born is not None]
+                self.c.executemany('UPDATE pig_records SET age_in_days = ? WHERE id = ?', updates)
 
             self.conn.commit()
         except Exception as e:
@@ -1,34 +1,27 @@
 import logging
 from tkinter import Tk, Label, Text, ttk, Toplevel, Entry, Button, messagebox
-from datetime import datetime
+from datetime import datetime, timedelta
 import sqlite3
-
-# Constants
-SLAUGHTER_AGE_THRESHOLD = 168  # Age threshold for slaughter
+from change_events import change_notifier
+from farm_logging import setup_logging, log_operation
+from farm_rules import SLAUGHTER_AGE_THRESHOLD
+from farm_schema import create_farm_tables
+from herd_model import HerdFrame, AGE_EXPRESSION, CHUNK_SIZE, iter_chunks, to_count
+from storage import FARM_DATABASE, resolve_storage
 
 # Setup logging
-logging.basicConfig(filename='slaughter_log.log', level=logging.ERROR)
+setup_logging()
 
 class DatabaseHandler:
     @staticmethod
-    def initialize_database():
+    def initialize_database(storage=None):
         try:
             # Create a SQLite database connection
-            conn = sqlite3.connect('farm_database.db')
+            conn = resolve_storage(storage, FARM_DATABASE).connect()
             cursor = conn.cursor()
 
-            # Create a table to store additional slaughter information if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS slaughter_information (
-                    id INTEGER PRIMARY KEY,
-                    batch_number TEXT,
-                    user_id TEXT,
-                    males_slaughtered INTEGER,
-                    females_slaughtered INTEGER,
-                    avg_weight REAL,
-                    date_slaughtered DATE
-                )
-            ''')
+            # Create the slaughter information table, and the registrations it reads and reduces, if they don't exist
+            create_farm_tables(cursor)
 
             conn.commit()
 
@@ -39,12 +32,12 @@ class DatabaseHandler:
             return None, None
 
 class SlaughterViewApp:
-    def __init__(self, window):
+    def __init__(self, window, storage=None):
         self.window = window
         self.window.title("Slaughter View")
 
         # Initialize database connection
-        self.conn, self.cursor = DatabaseHandler.initialize_database()
+        self.conn, self.cursor = DatabaseHandler.initialize_database(storage)
 
         # Create and place labels, text widget, and buttons
         Label(window, text="Batches Ready for Slaughter:").grid(row=0, column=0)
@@ -58,9 +51,16 @@ class SlaughterViewApp:
 
         self.slaughter_text_widget.config(wrap="none")  # Disable automatic line wrapping
 
+        # Rows currently shown, keyed by batch number: (age, reduce button)
+        self.batch_rows = {}
+
         # Fetch batches ready for slaughter and display in the text widget
         self.display_batches_for_slaughter()
 
+        # Patch the displayed rows when pig_registration changes instead of re-rendering everything
+        change_notifier.subscribe("pig_registration", self.on_registration_changed)
+        self.window.bind("<Destroy>", self.on_window_destroyed, add="+")
+
         # Add a close button to the window
         close_button = ttk.Button(window, text="Close", command=self.window.destroy)
         close_button.grid(row=2, column=0, columnspan=2)
@@ -79,9 +79,6 @@ class SlaughterViewApp:
 
     def display_batches_for_slaughter(self):
         try:
-            # Fetch batches ready for slaughter and their information from the database
-            slaughter_data = self.get_batches_for_slaughter()
-
             # Display titles
             titles = ["Batch Number", "Males", "Females", "Age (Days)"]
             for col, title in enumerate(titles):
@@ -90,46 +87,101 @@ class SlaughterViewApp:
                 self.slaughter_text_widget.tag_config("title", font=('bold', 10), underline=True)
             self.slaughter_text_widget.insert("end", "\n\n")
 
-            # Display batches ready for slaughter and their information in the text widget
-            if slaughter_data:
-                for row, batch in enumerate(slaughter_data, start=2):
-                    for col, value in enumerate(batch):
-                        self.slaughter_text_widget.insert("end", f"{value}\t\t")
-                    self.slaughter_text_widget.insert("end", "\n")
-
-                    # Add a button for each batch to trigger the reduction window
-                    slaughter_button = ttk.Button(self.slaughter_text_widget, text="Reduce", command=lambda b=batch[0]: self.reduce_pig_numbers(b))
-                    self.slaughter_text_widget.window_create("end", window=slaughter_button)
-                    self.slaughter_text_widget.insert("end", "\n")
+            # Stream batches ready for slaughter into the text widget chunk by chunk
+            self.batch_rows = {}
+            for slaughter_chunk in self.iter_batches_for_slaughter():
+                for batch in slaughter_chunk.rows():
+                    self.insert_batch_row(*batch)
 
-            else:
-                self.slaughter_text_widget.insert("end", "No batches ready for slaughter.")
+            if not self.batch_rows:
+                self.show_no_batches_message()
 
         except Exception as e:
             logging.error(f"An error occurred while displaying batches for slaughter: {e}")
 
+    def insert_batch_row(self, batch_number, males, females, age):
+        # Each batch is tagged so it can later be patched or removed on its own
+        row_tag = f"batch-{batch_number}"
+        # Drop the "no batches" message once there is something to show
+        if self.slaughter_text_widget.tag_ranges("empty_message"):
+            self.slaughter_text_widget.delete("empty_message.first", "empty_message.last")
+        start = self.slaughter_text_widget.index("end-1c")
+        self.slaughter_text_widget.insert("end", self.format_batch_line(batch_number, males, females, age), row_tag)
+
+        # Add a button for each batch to trigger the reduction window
+        slaughter_button = ttk.Button(self.slaughter_text_widget, text="Reduce", command=lambda b=batch_number: self.reduce_pig_numbers(b))
+        self.slaughter_text_widget.window_create("end", window=slaughter_button)
+        self.slaughter_text_widget.insert("end", "\n")
+        self.slaughter_text_widget.tag_add(row_tag, start, "end-1c")
+        self.batch_rows[batch_number] = (age, slaughter_button)
+
+    def format_batch_line(self, batch_number, males, females, age):
+        return "".join(f"{value}\t\t" for value in (batch_number, males, females, age)) + "\n"
+
+    def show_no_batches_message(self):
+        self.slaughter_text_widget.insert("end", "No batches ready for slaughter.", "empty_message")
+
+    def head_count(self, changes):
+        # Blank or non-numeric counts count as 0, as they do in the males + females > 0 filter of the full query
+        return (to_count(changes.get("males")) or 0) + (to_count(changes.get("females")) or 0)
+
+    def on_registration_changed(self, action, batch_number, changes):
+        if action == "insert":
+            age = changes.get("age")
+            if (age is not None and age >= SLAUGHTER_AGE_THRESHOLD and self.head_count(changes) > 0
+                    and batch_number not in self.batch_rows):
+                self.insert_batch_row(batch_number, changes.get("males", 0), changes.get("females", 0), age)
+            return
+
+        if batch_number not in self.batch_rows:
+            return
+
+        row_tag = f"batch-{batch_number}"
+        age, slaughter_button = self.batch_rows[batch_number]
+        males = changes.get("males", 0)
+        females = changes.get("females", 0)
+
+        if action == "delete" or self.head_count(changes) == 0:
+            # Nothing left to slaughter in this batch, so drop its row
+            self.slaughter_text_widget.delete(f"{row_tag}.first", f"{row_tag}.last")
+            slaughter_button.destroy()
+            del self.batch_rows[batch_number]
+            if not self.batch_rows:
+                self.show_no_batches_message()
+        else:
+            # Rewrite just the counts line of this batch
+            line_start = self.slaughter_text_widget.index(f"{row_tag}.first")
+            self.slaughter_text_widget.delete(line_start, f"{line_start} lineend + 1c")
+            self.slaughter_text_widget.insert(line_start, self.format_batch_line(batch_number, males, females, age), row_tag)
+
+    def on_window_destroyed(self, event):
+        if event.widget is self.window:
+            change_notifier.unsubscribe("pig_registration", self.on_registration_changed)
+
+    def select_batches_for_slaughter(self, cursor):
+        # Fetch batches with age above the threshold
+        today = datetime.now().date()
+        cutoff = today - timedelta(days=SLAUGHTER_AGE_THRESHOLD)
+        cursor.execute(f"SELECT batch_number, males, females, {AGE_EXPRESSION} AS age FROM pig_registration "
+                       f"WHERE dob <= ? AND males + females > 0 ORDER BY id", (str(today), str(cutoff)))
+        return cursor
+
     def get_batches_for_slaughter(self):
         try:
-            # Fetch batches with age above the threshold
-            self.cursor.execute("SELECT batch_number, males, females, dob FROM pig_registration")
-            batches_data = self.cursor.fetchall()
-
-            today = datetime.now().date()
-
-            # Filter batches based on age threshold
-            batches_for_slaughter = []
-            for batch in batches_data:
-                dob = datetime.strptime(batch[3], '%Y-%m-%d').date()
-                age = (today - dob).days
-                if age >= SLAUGHTER_AGE_THRESHOLD:
-                    batches_for_slaughter.append((batch[0], batch[1], batch[2], age))
-
-            return batches_for_slaughter
+            return HerdFrame.from_cursor(self.select_batches_for_slaughter(self.cursor))
 
         except Exception as e:
             logging.error(f"Error fetching batches for slaughter from the database: {e}")
             return None
 
+    def iter_batches_for_slaughter(self, chunk_size=CHUNK_SIZE, cancel_event=None):
+        try:
+            cursor = self.select_batches_for_slaughter(self.conn.cursor())
+            yield from HerdFrame.iter_frames(cursor, chunk_size, cancel_event)
+
+        except Exception as e:
+            logging.error(f"Error streaming batches for slaughter from the database: {e}")
+
     def reduce_pig_numbers(self, batch_number):
         try:
             # Create a new window for reducing pig numbers
@@ -189,10 +241,11 @@ class SlaughterViewApp:
             females_label.config(text=str(new_females_count))
 
             # Update the database with new counts
-            self.cursor.execute("UPDATE pig_registration SET males=?, females=? WHERE batch_number=?", (new_males_count, new_females_count, batch_number))
-            self.cursor.execute("INSERT INTO slaughter_information (batch_number, user_id, males_slaughtered, females_slaughtered, avg_weight, date_slaughtered) VALUES (?, ?, ?, ?, ?, ?)",
-                                (batch_number, "user123", slaughtered_male_count, slaughtered_female_count, 75.5, datetime.now().date()))
-            self.conn.commit()
+            with log_operation("perform_reduction", batch_number):
+                self.cursor.execute("UPDATE pig_registration SET males=?, females=? WHERE batch_number=?", (new_males_count, new_females_count, batch_number))
+                self.cursor.execute("INSERT INTO slaughter_information (batch_number, user_id, males_slaughtered, females_slaughtered, avg_weight, date_slaughtered) VALUES (?, ?, ?, ?, ?, ?)",
+                                    (batch_number, "user123", slaughtered_male_count, slaughtered_female_count, 75.5, datetime.now().date()))
+                self.conn.commit()
 
             # Close the reduce window
             window.destroy()
@@ -200,9 +253,9 @@ class SlaughterViewApp:
             # Display a success message
             messagebox.showinfo("Success", "Pig numbers updated successfully!")
 
-            # Refresh the batches for slaughter display
-            self.slaughter_text_widget.delete(1.0, "end")
-            self.display_batches_for_slaughter()
+            # Let the open views patch the changed batch
+            change_notifier.publish("pig_registration", "update", batch_number,
+                                    {"males": new_males_count, "females": new_females_count})
 
         except Exception as e:
             logging.error(f"Error updating pig numbers: {e}")
@@ -232,9 +285,9 @@ class SlaughterViewApp:
             # Display a success message
             messagebox.showinfo("Success", "Pig numbers and information updated successfully!")
 
-            # Refresh the batches for slaughter display
-            self.slaughter_text_widget.delete(1.0, "end")
-            self.display_batches_for_slaughter()
+            # Let the open views patch the changed batch
+            change_notifier.publish("pig_registration", "update", batch_number,
+                                    {"males": int(new_males), "females": int(new_females)})
 
         except Exception as e:
             logging.error(f"Error updating pig numbers and information: {e}")
@@ -277,10 +330,6 @@ class SlaughteredBatchesViewApp:
 
     def display_slaughtered_batches(self):
         try:
-            # Fetch slaughtered batches information from the database
-            self.cursor.execute("SELECT batch_number, user_id, males_slaughtered, females_slaughtered, avg_weight, date_slaughtered FROM slaughter_information")
-            slaughtered_data = self.cursor.fetchall()
-
             # Display titles including the new column
             titles = ["Batch Number", "User ID", "Males Slaughtered", "Females Slaughtered", "Average Weight", "Date Slaughtered", "Number Slaughtered"]
             for col, title in enumerate(titles):
@@ -289,24 +338,30 @@ class SlaughteredBatchesViewApp:
                 self.slaughtered_text_widget.tag_config("title", font=('bold', 10), underline=True)
             self.slaughtered_text_widget.insert("end", "\n\n")
 
-            # Display slaughtered batches information in the text widget
-            if slaughtered_data:
-                for row, batch in enumerate(slaughtered_data, start=2):
-                    # Fetch the number slaughtered from the corresponding batch ready for slaughter
-                    self.cursor.execute("SELECT COUNT(*) FROM slaughter_information WHERE batch_number=?", (batch[0],))
-                    number_slaughtered = self.cursor.fetchone()[0]
-
-                    for col, value in enumerate(batch):
+            # Stream slaughtered batches information into the text widget chunk by chunk
+            has_batches = False
+            for slaughtered_chunk in self.iter_slaughtered_batches():
+                has_batches = True
+                for batch in slaughtered_chunk:
+                    # The last column is the number of slaughter records for the batch
+                    for value in batch:
                         self.slaughtered_text_widget.insert("end", f"{value}\t\t")
-                    # Display the number slaughtered in the new column
-                    self.slaughtered_text_widget.insert("end", f"{number_slaughtered}\t\t")
                     self.slaughtered_text_widget.insert("end", "\n")
-            else:
+
+            if not has_batches:
                 self.slaughtered_text_widget.insert("end", "No slaughtered batches.")
 
         except Exception as e:
             logging.error(f"An error occurred while displaying slaughtered batches: {e}")
 
+    def iter_slaughtered_batches(self, chunk_size=CHUNK_SIZE, cancel_event=None):
+        # Count per batch with a window function instead of one COUNT query per row
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT batch_number, user_id, males_slaughtered, females_slaughtered, avg_weight, date_slaughtered, "
+                       "COUNT(*) OVER (PARTITION BY batch_number) AS number_slaughtered "
+                       "FROM slaughter_information ORDER BY id")
+        return iter_chunks(cursor, chunk_size, cancel_event)
+
 if __name__ == "__main__":
     slaughter_view_app = SlaughterViewApp(Tk())
     slaughter_view_app.window.mainloop()
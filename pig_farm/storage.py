@@ -0,0 +1,70 @@
+import os
+import sqlite3
+from urllib.parse import quote, unquote
+
+# Default databases live next to the modules, so the apps open the same files from any working directory
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+FARM_DATABASE = os.path.join(DATA_DIR, 'farm_database.db')
+BREEDING_DATABASE = os.path.join(DATA_DIR, 'pig_breeding.db')
+RECORDS_DATABASE = os.path.join(DATA_DIR, 'pigfarm_database.db')
+
+class StorageBackend:
+    """Where a database lives: a file (optionally read-only), or a private or shared in-memory database."""
+
+    __slots__ = ('kind', 'location', 'read_only')
+
+    def __init__(self, kind, location=None, read_only=False):
+        self.kind = kind
+        # Absolute path for files, the shared name for in-memory databases (None for a private one)
+        self.location = location
+        self.read_only = read_only
+
+    @property
+    def uri(self):
+        if self.kind == 'memory':
+            if self.location is None:
+                return "file::memory:"
+            return f"file:{quote(self.location)}?mode=memory&cache=shared"
+        return f"file:{quote(self.location)}" + ("?mode=ro" if self.read_only else "")
+
+    def connect(self, **kwargs):
+        return sqlite3.connect(self.uri, uri=True, **kwargs)
+
+    def as_read_only(self):
+        # In-memory databases are only reachable through this process, so they stay writable
+        if self.kind == 'memory':
+            return self
+        return StorageBackend('file', self.location, read_only=True)
+
+    def __repr__(self):
+        return f"StorageBackend({self.uri!r})"
+
+def file_storage(path):
+    return StorageBackend('file', os.path.abspath(path))
+
+def read_only_storage(path):
+    return StorageBackend('file', os.path.abspath(path), read_only=True)
+
+def memory_storage():
+    """A private in-memory database; every connect() gets a new, empty one."""
+    return StorageBackend('memory')
+
+def shared_memory_storage(name):
+    """An in-memory database shared by every connection in this process while at least one stays open."""
+    return StorageBackend('memory', name)
+
+def resolve_storage(storage, default_path):
+    """Accept a StorageBackend, a file path, ':memory:' or a 'file:' URI, falling back to default_path."""
+    if storage is None:
+        return file_storage(default_path)
+    if isinstance(storage, StorageBackend):
+        return storage
+    if storage == ':memory:':
+        return memory_storage()
+    if storage.startswith('file:'):
+        path, _, query = storage[len('file:'):].partition('?')
+        path = unquote(path)
+        if 'mode=memory' in query:
+            return shared_memory_storage(path)
+        return StorageBackend('file', os.path.abspath(path), read_only='mode=ro' in query)
+    return file_storage(storage)
@@ -0,0 +1,89 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from farm_schema import create_farm_tables
+from farm_sync import assign_new_node_id, enable_change_capture, open_conflicts, resolve_conflict, sync_databases
+
+def registrations(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(conn.execute("SELECT batch_number, dob, males, females, mother_id FROM pig_registration"))
+    finally:
+        conn.close()
+
+def register(path, batch_number, males=5, females=5):
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO pig_registration (batch_number, dob, males, females, mother_id) VALUES (?, ?, ?, ?, ?)",
+                 (batch_number, '2026-01-01', males, females, 'S1'))
+    conn.commit()
+    conn.close()
+
+def update_males(path, batch_number, males):
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE pig_registration SET males=? WHERE batch_number=?", (males, batch_number))
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def copies(tmp_path):
+    """An original farm database with one registered batch, and a copy made for a second site."""
+    local = str(tmp_path / "local.db")
+    remote = str(tmp_path / "remote.db")
+    conn = sqlite3.connect(local)
+    create_farm_tables(conn)
+    conn.commit()
+    conn.close()
+    register(local, 'A001')
+    conn = sqlite3.connect(local)
+    enable_change_capture(conn)
+    conn.close()
+    shutil.copy(local, remote)
+    conn = sqlite3.connect(remote)
+    assign_new_node_id(conn)
+    conn.close()
+    return local, remote
+
+def test_inserts_on_both_sides_reach_both_copies(copies):
+    local, remote = copies
+    # Both sites insert with local id 2
+    register(local, 'B001', males=1)
+    register(remote, 'C001', males=2)
+
+    result = sync_databases(local, remote)
+
+    assert result["pushed"] == {"applied": 1, "conflicts": 0}
+    assert result["pulled"] == {"applied": 1, "conflicts": 0}
+    assert registrations(local) == registrations(remote)
+    assert [row[0] for row in registrations(local)] == ['A001', 'B001', 'C001']
+
+    # Nothing is echoed back, and later edits to the other site's row still land on the right row
+    assert sync_databases(local, remote) == {"pushed": {"applied": 0, "conflicts": 0},
+                                             "pulled": {"applied": 0, "conflicts": 0}}
+    update_males(local, 'C001', 7)
+    sync_databases(local, remote)
+    assert ('C001', '2026-01-01', 7, 5, 'S1') in registrations(remote)
+    assert registrations(local) == registrations(remote)
+
+def test_conflicting_updates_can_be_resolved(copies):
+    local, remote = copies
+    update_males(local, 'A001', 3)
+    update_males(remote, 'A001', 4)
+
+    result = sync_databases(local, remote)
+    assert result["pushed"]["conflicts"] == 1
+    assert result["pulled"]["conflicts"] == 1
+
+    # Resolving on one copy is enough; the other closes its conflict when the outcome arrives
+    conn = sqlite3.connect(local)
+    [conflict] = open_conflicts(conn)
+    resolve_conflict(conn, conflict["id"], 'remote')
+    assert open_conflicts(conn) == []
+    conn.close()
+
+    sync_databases(local, remote)
+    assert registrations(local) == registrations(remote) == [('A001', '2026-01-01', 4, 5, 'S1')]
+    conn = sqlite3.connect(remote)
+    assert open_conflicts(conn) == []
+    conn.close()
@@ -0,0 +1,61 @@
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from farm_schema import create_farm_tables
+from health_screening import HealthScreening
+
+TODAY = date(2026, 6, 1)
+SCREEN_BATCHES = 50_000
+SCREEN_WEIGH_INS = 5
+SCREEN_BUDGET_SECONDS = 0.5  # The request: screen 50k batches in well under a second
+
+def new_farm(path, batches):
+    conn = sqlite3.connect(path)
+    create_farm_tables(conn)
+    conn.executemany("INSERT INTO pig_registration (batch_number, dob, males, females, mother_id) VALUES (?, ?, ?, ?, ?)",
+                     ((f"B{index:06d}", str(TODAY - timedelta(days=30 + index % 200)), 5, 5, 'S1')
+                      for index in range(batches)))
+    conn.commit()
+    conn.close()
+
+def test_latest_weigh_in_up_to_today_is_used(tmp_path):
+    path = str(tmp_path / "farm.db")
+    new_farm(path, 1)
+    screening = HealthScreening(path)
+    try:
+        screening.record_weights([('B000000', 1.0)], weigh_date=str(TODAY - timedelta(days=7)))
+        screening.record_weights([('B000000', 500.0)], weigh_date=str(TODAY))
+        screening.record_weights([('B000000', 1.0)], weigh_date=str(TODAY + timedelta(days=7)))
+
+        [(batch_number, age, _, actual_weight, _, health_status)] = screening.screen_herd(TODAY)
+        assert (batch_number, age, actual_weight, health_status) == ('B000000', 30, 500.0, 'Excellent')
+    finally:
+        screening.close_database()
+
+def test_initialize_failure_is_raised(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        HealthScreening(str(tmp_path / "missing" / "farm.db"))
+
+def test_screen_herd_meets_budget(tmp_path):
+    path = str(tmp_path / "farm.db")
+    new_farm(path, SCREEN_BATCHES)
+    screening = HealthScreening(path)
+    try:
+        for week in range(SCREEN_WEIGH_INS):
+            screening.record_weights(((f"B{index:06d}", 20.0 + index % 50) for index in range(SCREEN_BATCHES)),
+                                     weigh_date=str(TODAY - timedelta(days=7 * week)))
+        screening.conn.execute("ANALYZE")
+
+        # Best of three, so one slow run on a busy machine doesn't fail the check
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            rows = screening.screen_herd(TODAY)
+            timings.append(time.perf_counter() - start)
+        assert len(rows) == SCREEN_BATCHES
+        assert min(timings) < SCREEN_BUDGET_SECONDS, f"screen_herd took {min(timings):.3f}s for {SCREEN_BATCHES} batches"
+    finally:
+        screening.close_database()
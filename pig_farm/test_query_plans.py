@@ -0,0 +1,530 @@
+import ast
+import os
+import statistics
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from farm_fixture import MemoryFarm
+from feed_inventory import FeedInventory
+from health_screening import HealthScreening
+from herd_model import AGE_EXPRESSION
+from integrity_check import CLAMPED_REDUCTION_CHECK, RANGE_SIZE, TABLE_CHECKS
+from lineage import LineageIndex
+
+# Constants
+# Every module next to this one is checked except these, which only issue SQL against the data they generate
+EXCLUDED_MODULES = {
+    'farm_fixture': "seeds the fixture databases",
+}
+TEST_MODULE_PREFIX = 'test_'
+SQL_VERBS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+# Helpers that take SQL text and run it themselves: argument position -> the SQL they run for it
+SQL_HELPERS = {'fetch_page': {1: "{}", 3: "{} LIMIT ? OFFSET ?"}}
+# Module constants the statements use in f-strings
+DEFAULT_BINDINGS = {'AGE_EXPRESSION': AGE_EXPRESSION}
+BUDGET_ROWS = 100_000  # Budgets below are for this many registrations and pig records
+PLAN_ROWS = int(os.environ.get('PIG_FARM_PLAN_ROWS', 20_000))
+# Timings depend on the machine, so they are opt-in: PIG_FARM_PLAN_TIMINGS=1, or a larger factor on a slower machine
+TIMING_SCALE = float(os.environ.get('PIG_FARM_PLAN_TIMINGS', 0))
+TIMING_RUNS = 5
+MIN_BUDGET_MS = 1
+
+def normalize_sql(sql):
+    return " ".join(sql.split())
+
+def statement_text(node):
+    # f-strings keep their placeholders, e.g. {AGE_EXPRESSION}
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        return "".join(part.value if isinstance(part, ast.Constant) else "{" + ast.unparse(part.value) + "}"
+                       for part in node.values)
+    return None
+
+def render_fstring(node, bindings):
+    """Evaluate an f-string from the module source with the placeholders' names taken from bindings."""
+    parts = []
+    for part in node.values:
+        if isinstance(part, ast.Constant):
+            parts.append(part.value)
+            continue
+        value = eval(compile(ast.Expression(part.value), '<sql>', 'eval'), dict(bindings))
+        if part.conversion != -1:
+            value = {ord('s'): str, ord('r'): repr, ord('a'): ascii}[part.conversion](value)
+        parts.append(format(value, render_fstring(part.format_spec, bindings) if part.format_spec else ''))
+    return "".join(parts)
+
+class Statement:
+    """One SQL statement as written in an app module, with the function or method that issues it."""
+
+    __slots__ = ('location', 'lineno', 'node', 'wrapper', 'text')
+
+    def __init__(self, location, lineno, node, wrapper="{}"):
+        self.location = location
+        self.lineno = lineno
+        self.node = node
+        # How an SQL helper extends the text before running it
+        self.wrapper = wrapper
+        self.text = normalize_sql(statement_text(node))
+
+    def render(self, bindings):
+        """The SQL the module runs."""
+        sql = render_fstring(self.node, bindings) if isinstance(self.node, ast.JoinedStr) else self.node.value
+        return self.wrapper.format(sql)
+
+class StatementCollector(ast.NodeVisitor):
+    """Every literal SQL statement passed to execute/executemany or an SQL helper in one module."""
+
+    def __init__(self, module):
+        self.module = module
+        self.scope = []
+        self.statements = []
+
+    def visit_scope(self, node):
+        self.scope.append(node.name)
+        self.generic_visit(node)
+        self.scope.pop()
+
+    visit_ClassDef = visit_FunctionDef = visit_AsyncFunctionDef = visit_scope
+
+    def visit_Call(self, node):
+        location = ".".join([self.module, *self.scope]) if self.scope else f"{self.module}.<module>"
+        for argument, wrapper in self.sql_arguments(node):
+            text = statement_text(argument)
+            if text is not None and normalize_sql(text).upper().startswith(SQL_VERBS):
+                self.statements.append(Statement(location, node.lineno, argument, wrapper))
+        self.generic_visit(node)
+
+    def sql_arguments(self, node):
+        """(argument, wrapper) for the arguments of a call that may hold SQL text."""
+        if isinstance(node.func, ast.Attribute) and node.func.attr in ('execute', 'executemany') and node.args:
+            return [(node.args[0], "{}")]
+        if isinstance(node.func, ast.Name) and node.func.id in SQL_HELPERS:
+            return [(node.args[position], wrapper) for position, wrapper in SQL_HELPERS[node.func.id].items()
+                    if position < len(node.args)]
+        return []
+
+def app_modules(directory=None):
+    """Every module in the directory except the excluded ones and the tests."""
+    directory = directory or os.path.dirname(os.path.abspath(__file__))
+    return sorted(name[:-3] for name in os.listdir(directory)
+                  if name.endswith('.py') and name[:-3] not in EXCLUDED_MODULES
+                  and not name.startswith(TEST_MODULE_PREFIX))
+
+def collect_statements(modules=None, directory=None):
+    directory = directory or os.path.dirname(os.path.abspath(__file__))
+    statements = []
+    for module in modules or app_modules(directory):
+        path = os.path.join(directory, f"{module}.py")
+        with open(path) as source_file:
+            collector = StatementCollector(module)
+            collector.visit(ast.parse(source_file.read(), path))
+        statements.extend(collector.statements)
+    return statements
+
+class QueryCheck:
+    """A statement in the app modules, the index its plan must use and its time budget at BUDGET_ROWS.
+
+    The statement is found by the function that issues it ('module.Class.method') and the start of its text; functions
+    issuing the same statement share a check.
+    """
+
+    __slots__ = ('locations', 'prefix', 'params', 'database', 'index', 'budget_ms', 'bindings')
+
+    def __init__(self, locations, prefix, params=(), database='farm', index=None, budget_ms=5.0, bindings=None):
+        self.locations = (locations,) if isinstance(locations, str) else tuple(locations)
+        self.prefix = prefix
+        self.params = params
+        self.database = database
+        # None means a full scan is the right plan, e.g. listing every row
+        self.index = index
+        self.budget_ms = budget_ms
+        # Values for f-string placeholders such as {table}
+        self.bindings = {**DEFAULT_BINDINGS, **(bindings or {})}
+
+    def matches(self, statement):
+        return statement.location in self.locations and statement.text.startswith(self.prefix)
+
+TODAY = date(2026, 1, 1)
+CUTOFF = TODAY - timedelta(days=168)
+PAGE_SIZE = 50
+# A batch from the middle of the dataset, and ids and change_log seqs near its end, i.e. what an incremental refresh or
+# sync picks up
+MID_ID = PLAN_ROWS // 2
+MID_BATCH = f"B{MID_ID:06d}"
+MID_ROW_KEY = f"base:{MID_ID}"
+RECENT_ID = PLAN_ROWS - 100
+RECENT_SLAUGHTER_ID = PLAN_ROWS // 3 - 100
+RECENT_SEQ = PLAN_ROWS + PLAN_ROWS // 3 - 100
+REGISTRATION_COLUMNS = ('batch_number', 'dob', 'males', 'females', 'mother_id')
+REGISTRATION_CHECKS = TABLE_CHECKS['pig_registration'] + [CLAMPED_REDUCTION_CHECK]
+# {table} statements are checked on pig_registration
+SYNC_BINDINGS = {'table': 'pig_registration', 'columns': REGISTRATION_COLUMNS}
+SCAN_BINDINGS = {
+    'table': 'pig_registration',
+    'flags': ", ".join(f"({condition})" for _, condition, _ in REGISTRATION_CHECKS),
+    'any_failed': " OR ".join(f"({condition})" for _, condition, _ in REGISTRATION_CHECKS),
+}
+QUARANTINE_BINDINGS = {
+    'table': 'pig_registration',
+    'row_json': "json_object(" + ", ".join(f"'{column}', {column}" for column in ('id', *REGISTRATION_COLUMNS)) + ")",
+}
+
+# Budgets are in milliseconds at BUDGET_ROWS and scale with the fixture size
+QUERY_CHECKS = [
+    # Reverse rowid scans stopped by LIMIT show up as a plain SCAN, so only the budget guards them
+    QueryCheck(("admission.PigRegistrationApp.get_last_batch_number",
+                "farm_api.write_registration"),
+               "SELECT batch_number FROM pig_registration", budget_ms=1),
+    QueryCheck(("admission.PigRegistrationApp.insert_data_into_database",
+                "farm_api.write_registration"),
+               "INSERT INTO pig_registration", ('Z999', '2026-01-01', 5, 5, 'S1'), budget_ms=2),
+    QueryCheck(("farm_api.write_slaughter",
+                "slaughter.SlaughterViewApp.reduce_pig_numbers",
+                "slaughter.SlaughterViewApp.perform_reduction"),
+               "SELECT males, females FROM", (MID_BATCH,), index="idx_pig_registration_batch", budget_ms=1),
+    QueryCheck(("farm_api.write_slaughter",
+                "slaughter.SlaughterViewApp.perform_reduction",
+                "slaughter.SlaughterViewApp.update_pig_numbers"),
+               "UPDATE pig_registration", (1, 1, MID_BATCH), index="idx_pig_registration_batch", budget_ms=2),
+    QueryCheck(("farm_api.write_slaughter",
+                "slaughter.SlaughterViewApp.perform_reduction",
+                "slaughter.SlaughterViewApp.update_pig_numbers"),
+               "INSERT INTO slaughter_information", (MID_BATCH, 'user123', 1, 1, 75.5, '2026-01-01'), budget_ms=2),
+    QueryCheck("slaughter.SlaughterViewApp.select_batches_for_slaughter", "SELECT batch_number, males, females",
+               (str(TODAY), str(TODAY - timedelta(days=168))), budget_ms=1000),
+    QueryCheck("slaughter.SlaughteredBatchesViewApp.iter_slaughtered_batches",
+               "SELECT batch_number, user_id, males_slaughtered", index="idx_slaughter_information_batch",
+               budget_ms=1000),
+    QueryCheck("herd_model.select_registrations", "SELECT batch_number, dob, males", (str(TODAY),), budget_ms=1000,
+               bindings={'where': ""}),
+    QueryCheck("weight.PigDatabase.get_pig_batches", "SELECT batch_number FROM pig_registration", budget_ms=150),
+    QueryCheck("weight.PigDatabase.get_pig_data", "SELECT dob FROM pig_registration", (MID_BATCH,),
+               index="idx_pig_registration_batch", budget_ms=1),
+    QueryCheck("zaa.PigBreedingApp.insert_data_into_database", "INSERT INTO pig_breeding",
+               ('S1', '2026-01-01', '2026-05-25'), budget_ms=2),
+    QueryCheck("zaa.PigBreedingApp.get_data_from_database", "SELECT pig_id, served_date, expected_birth_date",
+               budget_ms=1),
+    QueryCheck("zaa.PigBreedingApp.delete_pig_from_database", "DELETE FROM pig_breeding", ('S1234',),
+               index="idx_pig_breeding_pig_id", budget_ms=2),
+    QueryCheck("zaa.PigBreedingApp.iter_database_entries", "SELECT id, pig_id, served_date", (str(TODAY),),
+               index="idx_pig_breeding_expected_birth", budget_ms=150),
+    QueryCheck("farm_calendar.iter_farrowing_events", "SELECT expected_birth_date, pig_id, served_date",
+               (str(TODAY), str(TODAY + timedelta(days=365))), index="idx_pig_breeding_expected_birth", budget_ms=50),
+    QueryCheck("farm_calendar.iter_batch_milestones", "SELECT date(dob, ?), batch_number",
+               ('+168 days', str(TODAY - timedelta(days=168)), str(TODAY + timedelta(days=197))),
+               index="idx_pig_registration_dob", budget_ms=50),
+    QueryCheck("pig_database.PigDatabase.add_record", "INSERT INTO pig_records", (999999, 1, '2026-01-01', 5, 5, 0),
+               database='records', budget_ms=2),
+    QueryCheck("pig_database.PigDatabase.delete_record", "DELETE FROM pig_records", (MID_ID,), database='records',
+               index="INTEGER PRIMARY KEY", budget_ms=2),
+    QueryCheck("pig_database.PigDatabase.iter_records", "SELECT * FROM pig_records", database='records',
+               budget_ms=1000),
+    QueryCheck("pig_database.PigDatabase.update_age_in_days", "UPDATE pig_records", (10, MID_ID), database='records',
+               index="INTEGER PRIMARY KEY", budget_ms=2),
+    QueryCheck("pig_database.PigDatabase.get_all_pig_batches", "SELECT DISTINCT batch_number FROM", database='records',
+               index="idx_pig_records_batch", budget_ms=150),
+    QueryCheck("pig_database.PigDatabase.get_pig_data_by_batch_number", "SELECT * FROM pig_records", (MID_ID,),
+               database='records', index="idx_pig_records_batch", budget_ms=1),
+
+    # API pages; fetch_page appends LIMIT and OFFSET
+    QueryCheck(("farm_api.query_registrations",
+                "farm_api.query_feed_projections"),
+               "SELECT COUNT(*) FROM pig_registration", budget_ms=1),
+    QueryCheck("farm_api.query_registrations", "SELECT batch_number, dob, males", (str(TODAY), PAGE_SIZE, 0),
+               budget_ms=1),
+    QueryCheck("farm_api.query_slaughter_eligible", "SELECT COUNT(*) FROM pig_registration", (str(CUTOFF),),
+               index="idx_pig_registration_dob", budget_ms=50),
+    QueryCheck("farm_api.query_slaughter_eligible", "SELECT batch_number, males, females",
+               (str(TODAY), str(CUTOFF), PAGE_SIZE, 0), index="idx_pig_registration_dob", budget_ms=1),
+    QueryCheck("farm_api.query_farrowing_due", "SELECT COUNT(*) FROM breeding.pig_breeding",
+               (str(TODAY), str(TODAY + timedelta(days=30))), index="idx_pig_breeding_expected_birth", budget_ms=1),
+    QueryCheck("farm_api.query_farrowing_due", "SELECT pig_id, served_date, expected_birth_date",
+               (str(TODAY), str(TODAY), str(TODAY + timedelta(days=30)), PAGE_SIZE, 0),
+               index="idx_pig_breeding_expected_birth", budget_ms=1),
+    QueryCheck("farm_api.query_feed_projections", "SELECT batch_number, males + females AS pigs",
+               (str(TODAY), PAGE_SIZE, 0), budget_ms=1),
+    QueryCheck("farm_api.write_breeding", "INSERT INTO breeding.pig_breeding", ('S1', '2026-01-01', '2026-05-25'),
+               budget_ms=1),
+
+    # farm_shards, each on one farm's own files
+    QueryCheck("farm_shards.shard_slaughter_eligible", "SELECT COUNT(*), COALESCE(SUM(males), 0)", (str(CUTOFF),),
+               budget_ms=150),
+    QueryCheck("farm_shards.shard_farrowings_due", "SELECT pig_id, served_date, expected_birth_date",
+               (str(TODAY), str(TODAY + timedelta(days=30))), database='breeding',
+               index="idx_pig_breeding_expected_birth", budget_ms=1),
+    QueryCheck("farm_shards.shard_feed_forecast", "SELECT CAST(julianday(?) - julianday(dob)", (str(TODAY),),
+               budget_ms=150),
+
+    # farm_sync; {table} statements are checked on pig_registration
+    QueryCheck("farm_sync.enable_change_capture", "SELECT COUNT(*) FROM sync_node", budget_ms=1),
+    QueryCheck("farm_sync.enable_change_capture", "INSERT INTO sync_node", ('node2',), budget_ms=1),
+    QueryCheck(("farm_sync.enable_change_capture",
+                "integrity_check.IntegrityScanner.plan_tasks",
+                "integrity_check.IntegrityScanner.quarantine"),
+               "SELECT name FROM sqlite_master", budget_ms=1),
+    QueryCheck("farm_sync.enable_change_capture", "INSERT OR IGNORE INTO sync_rows", budget_ms=1000,
+               bindings={'table': 'pig_registration'}),
+    QueryCheck("farm_sync.node_id", "SELECT node_id FROM sync_node", budget_ms=1),
+    QueryCheck("farm_sync.assign_new_node_id", "UPDATE sync_node", ('node2',), budget_ms=1),
+    QueryCheck("farm_sync.assign_new_node_id", "DELETE FROM sync_peers", budget_ms=1),
+    QueryCheck("farm_sync.peer_state", "INSERT OR IGNORE INTO sync_peers", ('peer',), budget_ms=1),
+    QueryCheck("farm_sync.peer_state", "SELECT last_sent_seq, last_received_seq FROM", ('peer',),
+               index="sqlite_autoindex_sync_peers_1", budget_ms=1),
+    QueryCheck("farm_sync.export_changes", "SELECT seq, table_name, row_key", (RECENT_SEQ, 'peer'),
+               index="INTEGER PRIMARY KEY", budget_ms=1),
+    QueryCheck(("farm_sync.export_changes",
+                "farm_sync.apply_from_peer"),
+               "SELECT COALESCE(MAX(seq), 0) FROM", budget_ms=1),
+    QueryCheck("farm_sync.local_row_id", "SELECT row_id FROM sync_rows", ('pig_registration', MID_ROW_KEY),
+               index="idx_sync_rows_key", budget_ms=1),
+    QueryCheck("farm_sync.apply_row_change", "DELETE FROM {table}", (MID_ID,), index="INTEGER PRIMARY KEY", budget_ms=1,
+               bindings=SYNC_BINDINGS),
+    QueryCheck("farm_sync.apply_row_change", "UPDATE {table}", (MID_BATCH, '2026-01-01', 1, 1, 'S1', MID_ID),
+               index="INTEGER PRIMARY KEY", budget_ms=1, bindings=SYNC_BINDINGS),
+    QueryCheck("farm_sync.apply_row_change", "SELECT COALESCE(MAX(id), 0) + 1 FROM {table}", budget_ms=1,
+               bindings=SYNC_BINDINGS),
+    QueryCheck("farm_sync.apply_row_change", "INSERT INTO sync_rows", ('pig_registration', 999999, 'peer:999999'),
+               budget_ms=1),
+    QueryCheck("farm_sync.apply_row_change", "INSERT INTO {table}", (999999, 'Z999', '2026-01-01', 5, 5, 'S1'),
+               budget_ms=1, bindings=SYNC_BINDINGS),
+    QueryCheck(("farm_sync.matches_local_row",
+                "farm_sync.resolve_conflict"),
+               "SELECT * FROM {table}", (MID_ID,), index="INTEGER PRIMARY KEY", budget_ms=1, bindings=SYNC_BINDINGS),
+    QueryCheck("farm_sync.apply_from_peer", "UPDATE change_log", ('peer', RECENT_SEQ), index="INTEGER PRIMARY KEY",
+               budget_ms=1),
+    QueryCheck("farm_sync.import_changes", "SELECT 1 FROM change_log", ('pig_registration', MID_ROW_KEY, 0, 'peer'),
+               index="idx_change_log_row", budget_ms=1),
+    QueryCheck("farm_sync.import_changes", "INSERT INTO sync_conflicts",
+               ('peer', 'pig_registration', MID_ROW_KEY, 'update', '{}'), budget_ms=1),
+    QueryCheck("farm_sync.settle_conflicts", "UPDATE sync_conflicts", ('peer', 'peer', 'pig_registration', MID_ROW_KEY),
+               budget_ms=1),
+    QueryCheck("farm_sync.import_changes", "UPDATE sync_peers", (10, 10, 'peer'), index="sqlite_autoindex_sync_peers_1",
+               budget_ms=1),
+    QueryCheck("farm_sync.open_conflicts", "SELECT id, peer_id, table_name", budget_ms=1),
+    QueryCheck("farm_sync.resolve_conflict", "SELECT table_name, row_key, remote_operation", (1,),
+               index="INTEGER PRIMARY KEY", budget_ms=1),
+    QueryCheck("farm_sync.resolve_conflict", "INSERT INTO change_log",
+               ('pig_registration', MID_ROW_KEY, 'update', '{}'), budget_ms=1),
+    QueryCheck("farm_sync.resolve_conflict", "UPDATE sync_conflicts", ('local', 1), index="INTEGER PRIMARY KEY",
+               budget_ms=1),
+    QueryCheck("farm_sync.acknowledge", "UPDATE sync_peers", (10, 'peer'), index="sqlite_autoindex_sync_peers_1",
+               budget_ms=1),
+
+    # feed_inventory, on its own connection for the feed_schedule temp table
+    QueryCheck("feed_inventory.FeedInventory.initialize_database", "INSERT OR IGNORE INTO feed_stock", ('feed 3',),
+               database='feed', budget_ms=1),
+    QueryCheck("feed_inventory.FeedInventory.load_feed_schedule", "DELETE FROM feed_schedule", database='feed',
+               budget_ms=1),
+    QueryCheck("feed_inventory.FeedInventory.load_feed_schedule", "INSERT INTO feed_schedule", (9999, 'feed 4', 2.5),
+               database='feed', budget_ms=1),
+    QueryCheck("feed_inventory.FeedInventory.record_delivery", "INSERT INTO feed_deliveries",
+               ('feed 3', str(TODAY), 1000.0, 'mill'), database='feed', budget_ms=1),
+    QueryCheck("feed_inventory.FeedInventory.record_delivery", "UPDATE feed_stock SET delivered_kg", (1000.0, 'feed 3'),
+               database='feed', index="sqlite_autoindex_feed_stock_1", budget_ms=1),
+    QueryCheck("feed_inventory.FeedInventory.record_delivery", "UPDATE feed_stock SET rolled_up_to", (str(TODAY),),
+               database='feed', budget_ms=1),
+    QueryCheck("feed_inventory.FeedInventory.roll_up", "SELECT MIN(rolled_up_to) FROM feed_stock", (str(TODAY),),
+               database='feed', budget_ms=1),
+    QueryCheck("feed_inventory.FeedInventory.roll_up", "WITH RECURSIVE days(day) AS",
+               {"last_day": str(TODAY - timedelta(days=1)), "through": str(TODAY + timedelta(days=6)),
+                "max_age": "-240 days"},
+               database='feed', index="idx_pig_registration_dob", budget_ms=150),
+    QueryCheck("feed_inventory.FeedInventory.roll_up", "UPDATE feed_stock", {"through": str(TODAY - timedelta(days=1))},
+               database='feed', index="PRIMARY KEY", budget_ms=1),
+    QueryCheck("feed_inventory.FeedInventory.get_daily_consumption", "SELECT day, consumed_kg, pigs",
+               ('feed 3', str(TODAY - timedelta(days=30)), str(TODAY)), database='feed', index="PRIMARY KEY",
+               budget_ms=1),
+    QueryCheck("feed_inventory.FeedInventory.days_of_stock", "SELECT st.feed_type",
+               {"window": "-7 days", "average_days": 7}, database='feed', index="PRIMARY KEY", budget_ms=1),
+
+    # health_screening, on its own connection for the expected_growth temp table
+    QueryCheck("health_screening.HealthScreening.load_expected_weight_curve", "DELETE FROM expected_growth",
+               database='health', budget_ms=1),
+    QueryCheck("health_screening.HealthScreening.load_expected_weight_curve", "INSERT INTO expected_growth",
+               (9999, 120.0), database='health', budget_ms=1),
+    QueryCheck("health_screening.HealthScreening.record_weights", "INSERT INTO batch_weights",
+               (MID_BATCH, str(TODAY), 60.5), database='health', budget_ms=1),
+    QueryCheck("health_screening.HealthScreening.screen_herd", "WITH aged AS (",
+               {"today": str(TODAY), "margin": 10, "max_age": 240}, database='health',
+               index="idx_batch_weights_batch_date", budget_ms=3000),
+
+    # herd_ledger
+    QueryCheck("herd_ledger.HerdLedger.initialize_database", "INSERT OR IGNORE INTO headcount_ledger_sources",
+               ('pig_registration',), budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.last_id", "SELECT last_id FROM headcount_ledger_sources", ('pig_registration',),
+               index="sqlite_autoindex_headcount_ledger_sources_1", budget_ms=1),
+    QueryCheck(("herd_ledger.HerdLedger.collect_new_events",
+                "lineage.LineageIndex.refresh"),
+               "SELECT COALESCE(MAX(id), 0) FROM slaughter_information", budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.collect_new_events", "SELECT COALESCE(MAX(id), 0) FROM pig_registration",
+               budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.collect_new_events", "SELECT date(r.dob), CAST(COALESCE(r.males, 0)",
+               (RECENT_SLAUGHTER_ID, RECENT_ID, PLAN_ROWS), index="idx_slaughter_information_batch", budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.collect_new_events",
+               "SELECT date(date_slaughtered), SUM(males_slaughtered), SUM(females_slaughtered)",
+               (RECENT_SLAUGHTER_ID, PLAN_ROWS), index="INTEGER PRIMARY KEY", budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.refresh", "INSERT INTO headcount_ledger", (str(TODAY), 1, 1), budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.refresh",
+               "UPDATE headcount_ledger_sources SET last_id=? WHERE source='pig_registration'", (PLAN_ROWS,),
+               index="sqlite_autoindex_headcount_ledger_sources_1", budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.refresh",
+               "UPDATE headcount_ledger_sources SET last_id=? WHERE source='slaughter_information'", (PLAN_ROWS,),
+               index="sqlite_autoindex_headcount_ledger_sources_1", budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.recompute_totals", "UPDATE headcount_ledger",
+               (0, 0, str(TODAY - timedelta(days=30))), index="PRIMARY KEY", budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.headcount_as_of_day_before", "SELECT males_total, females_total FROM",
+               (str(TODAY - timedelta(days=30)),), index="PRIMARY KEY", budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.iter_headcount_series", "SELECT event_date, males_total, females_total",
+               (str(TODAY - timedelta(days=365)), str(TODAY)), index="PRIMARY KEY", budget_ms=2),
+    QueryCheck("herd_ledger.HerdLedger.reconcile", "SELECT COALESCE(SUM(CAST(males AS INTEGER))", budget_ms=150),
+    QueryCheck("herd_ledger.HerdLedger.rebuild", "DELETE FROM headcount_ledger", budget_ms=1),
+    QueryCheck("herd_ledger.HerdLedger.rebuild", "UPDATE headcount_ledger_sources", budget_ms=1),
+
+    # herd_simulation
+    QueryCheck("herd_simulation.load_herd_state", "SELECT CAST(julianday(?) - julianday(dob)", (str(TODAY),),
+               budget_ms=1000),
+    QueryCheck("herd_simulation.load_herd_state", "SELECT r.males + r.females", index="idx_slaughter_information_batch",
+               budget_ms=1000),
+    QueryCheck("herd_simulation.load_herd_state", "SELECT DISTINCT mother_id FROM", budget_ms=300),
+    QueryCheck("herd_simulation.load_herd_state", "SELECT pig_id, CAST(julianday(expected_birth_date)",
+               (str(TODAY), str(TODAY)), database='breeding', index="idx_pig_breeding_expected_birth", budget_ms=50),
+    QueryCheck("herd_simulation.load_herd_state", "SELECT DISTINCT pig_id FROM", database='breeding',
+               index="idx_pig_breeding_pig_id", budget_ms=50),
+
+    # integrity_check, on one RANGE_SIZE range of pig_registration
+    QueryCheck("integrity_check.IntegrityScanner.plan_tasks", "SELECT MIN(rowid), MAX(rowid) FROM", budget_ms=150,
+               bindings={'table': 'pig_registration'}),
+    QueryCheck("integrity_check.scan_range", "SELECT rowid, {flags} FROM", (1, RANGE_SIZE), index="INTEGER PRIMARY KEY",
+               budget_ms=3000, bindings=SCAN_BINDINGS),
+    QueryCheck("integrity_check.IntegrityScanner.quarantine", "INSERT INTO quarantine", ('["bad_dob"]', MID_ID),
+               index="INTEGER PRIMARY KEY", budget_ms=1, bindings=QUARANTINE_BINDINGS),
+    QueryCheck("integrity_check.IntegrityScanner.quarantine", "DELETE FROM {table}", (MID_ID,),
+               index="INTEGER PRIMARY KEY", budget_ms=1, bindings={'table': 'pig_registration'}),
+    QueryCheck("integrity_check.has_dependent_rows", "SELECT 1 FROM {dependent}", (MID_ID,),
+               index="idx_slaughter_information_batch", budget_ms=1,
+               bindings={'dependent': 'slaughter_information', 'table': 'pig_registration'}),
+
+    # lineage, on its own connection for normalize_sow_id
+    QueryCheck("lineage.LineageIndex.initialize_database", "INSERT OR IGNORE INTO lineage_sources", database='lineage',
+               budget_ms=1),
+    QueryCheck("lineage.LineageIndex.refresh", "SELECT COALESCE(MAX(registration_id), 0) FROM", database='lineage',
+               budget_ms=1),
+    QueryCheck("lineage.LineageIndex.refresh", "SELECT last_id FROM lineage_sources", database='lineage',
+               index="sqlite_autoindex_lineage_sources_1", budget_ms=1),
+    QueryCheck("lineage.LineageIndex.refresh", "INSERT INTO litters", (PLAN_ROWS,), database='lineage',
+               index="INTEGER PRIMARY KEY", budget_ms=1),
+    QueryCheck("lineage.LineageIndex.refresh", "SELECT sow_key FROM litters", (RECENT_ID, RECENT_SLAUGHTER_ID),
+               database='lineage', index="idx_litters_batch", budget_ms=2),
+    QueryCheck("lineage.LineageIndex.refresh", "INSERT OR IGNORE INTO sows", (RECENT_ID,), database='lineage',
+               index="INTEGER PRIMARY KEY", budget_ms=1),
+    QueryCheck("lineage.LineageIndex.link_breeding_records", "INSERT OR IGNORE INTO sows", database='lineage',
+               budget_ms=300),
+    QueryCheck("lineage.LineageIndex.link_breeding_records", "UPDATE sows", database='lineage', budget_ms=300),
+    QueryCheck("lineage.LineageIndex.refresh_productivity", "INSERT OR REPLACE INTO sow_productivity",
+               ('S1', 'S2', 'S3'), database='lineage', index="idx_litters_sow_dob", budget_ms=50,
+               bindings={'where': "WHERE l.sow_key IN (?, ?, ?)"}),
+    QueryCheck("lineage.LineageIndex.refresh", "UPDATE lineage_sources", (PLAN_ROWS,), database='lineage',
+               index="sqlite_autoindex_lineage_sources_1", budget_ms=1),
+    QueryCheck("lineage.LineageIndex.rebuild", "DELETE FROM litters", database='lineage', budget_ms=50),
+    QueryCheck("lineage.LineageIndex.rebuild", "DELETE FROM sow_productivity", database='lineage', budget_ms=1),
+    QueryCheck("lineage.LineageIndex.rebuild", "UPDATE sows", database='lineage', budget_ms=50),
+    QueryCheck("lineage.LineageIndex.rebuild", "UPDATE lineage_sources", database='lineage', budget_ms=1),
+    QueryCheck("lineage.LineageIndex.record_birth_litter", "INSERT INTO sows", ('S1', MID_BATCH), database='lineage',
+               budget_ms=1),
+    QueryCheck("lineage.LineageIndex.get_litters", "SELECT batch_number, dob FROM", ('S1',), database='lineage',
+               index="idx_litters_sow_dob", budget_ms=1),
+    QueryCheck("lineage.LineageIndex.get_ancestors", "WITH RECURSIVE ancestry(generation, sow_key", ('S1', 20),
+               database='lineage', index="idx_litters_batch", budget_ms=1),
+    QueryCheck("lineage.LineageIndex.get_descendant_sows", "WITH RECURSIVE descent(generation, sow_key)", ('S1', 20),
+               database='lineage', index="idx_sows_born_in", budget_ms=50),
+    QueryCheck("lineage.LineageIndex.get_productivity", "SELECT * FROM sow_productivity", ('S1',), database='lineage',
+               index="sqlite_autoindex_sow_productivity_1", budget_ms=1),
+    QueryCheck("lineage.LineageIndex.select_breeding_sows", "SELECT p.sow_key, s.breeding_pig_id, p.litters", (1, 20),
+               database='lineage', index="idx_sow_productivity_rank", budget_ms=1),
+
+    # backup
+    QueryCheck("backup.BackupService.backup_database", "SELECT COUNT(*) FROM sqlite_master", budget_ms=1),
+]
+
+STATEMENTS = collect_statements()
+
+def open_connections(memory_farm):
+    """Connections as each part of the app opens them; services with temp tables or SQL functions use their own."""
+    farm_conn = memory_farm.farm.connect()
+    farm_conn.execute("ATTACH DATABASE ? AS breeding", (memory_farm.breeding.uri,))
+    connections = {'farm': farm_conn, 'breeding': memory_farm.breeding.connect(),
+                   'records': memory_farm.records.connect()}
+    # Statistics first, so the service connections below plan with them too; the farm's covers attached breeding
+    for name in ('farm', 'records'):
+        connections[name].execute("ANALYZE")
+    connections['lineage'] = LineageIndex(memory_farm.farm, memory_farm.breeding).conn
+    connections['feed'] = FeedInventory(memory_farm.farm).conn
+    connections['health'] = HealthScreening(memory_farm.farm).conn
+    # Then each connection moves onto a private copy of its databases, so shared-cache locking stays out of the timings.
+    # Temp tables and SQL functions belong to the connection and survive the swap.
+    images = {name: connections[name].serialize() for name in ('farm', 'breeding', 'records')}
+    for name, conn in connections.items():
+        conn.deserialize(images.get(name, images['farm']))
+        for _, schema, _ in conn.execute("PRAGMA database_list").fetchall():
+            if schema in images:
+                conn.deserialize(images[schema], name=schema)
+    return connections
+
+def time_statement(conn, sql, params, runs=TIMING_RUNS):
+    timings = []
+    for _ in range(runs):
+        # Writes are rolled back so every run sees the same data
+        conn.execute("SAVEPOINT plan_check")
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+        conn.execute("ROLLBACK TO plan_check")
+        conn.execute("RELEASE plan_check")
+    return statistics.median(timings)
+
+def scaled_budget_ms(check):
+    return max(check.budget_ms * PLAN_ROWS / BUDGET_ROWS, MIN_BUDGET_MS) * TIMING_SCALE
+
+@pytest.fixture(scope='module')
+def connections():
+    # Seeded in memory so the timings measure SQLite, not the disk
+    with MemoryFarm(PLAN_ROWS, today=TODAY) as memory_farm:
+        connections = open_connections(memory_farm)
+        try:
+            yield connections
+        finally:
+            for conn in connections.values():
+                conn.close()
+
+def test_every_statement_has_one_check():
+    problems = []
+    for statement in STATEMENTS:
+        checks = [check for check in QUERY_CHECKS if check.matches(statement)]
+        if len(checks) != 1:
+            problems.append(f"{len(checks)} plan checks for {statement.location} (line {statement.lineno}): "
+                            f"{statement.text}")
+    assert not problems, "\n".join(problems)
+
+PLAN_CASES = [(check, location) for check in QUERY_CHECKS for location in check.locations]
+
+@pytest.mark.parametrize('check, location', PLAN_CASES,
+                         ids=lambda value: value if isinstance(value, str) else value.prefix)
+def test_query_plan(connections, check, location):
+    statements = [statement for statement in STATEMENTS if statement.location == location and check.matches(statement)]
+    assert statements, f"{location} no longer issues a statement starting with {check.prefix!r}"
+    assert len({statement.text for statement in statements}) == 1, \
+        f"{check.prefix!r} matches more than one statement in {location}"
+
+    conn = connections[check.database]
+    sql = statements[0].render(check.bindings)
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", check.params)]
+    if check.index:
+        assert any(check.index in detail for detail in plan), f"Expected {check.index} in plan: {plan}"
+
+    if TIMING_SCALE:
+        elapsed_ms = time_statement(conn, sql, check.params)
+        budget_ms = scaled_budget_ms(check)
+        assert elapsed_ms <= budget_ms, f"{elapsed_ms:.1f}ms over the {budget_ms:g}ms budget"
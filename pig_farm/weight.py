@@ -2,26 +2,20 @@ import random
 from tkinter import Tk, Label, OptionMenu, StringVar, simpledialog, messagebox
 import sqlite3
 from datetime import datetime
+from farm_rules import FEED_DATA, classify_health, find_feed_band
+from farm_schema import create_registration_table
+from storage import FARM_DATABASE, resolve_storage
 
 class PigDatabase:
-    def __init__(self):
-        self.conn, self.cursor = self.initialize_database()
+    def __init__(self, storage=None):
+        self.conn, self.cursor = self.initialize_database(storage)
 
-    def initialize_database(self):
+    def initialize_database(self, storage=None):
         try:
-            conn = sqlite3.connect('farm_database.db')
+            conn = resolve_storage(storage, FARM_DATABASE).connect()
             cursor = conn.cursor()
 
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS pig_registration (
-                    id INTEGER PRIMARY KEY,
-                    batch_number TEXT,
-                    dob DATE,
-                    males INTEGER,
-                    females INTEGER,
-                    mother_id TEXT
-                )
-            ''')
+            create_registration_table(cursor)
 
             conn.commit()
             return conn, cursor
@@ -62,23 +56,11 @@ class PigDatabase:
             return {"batch_number": "", "dob": None, "age": 0}
 
 class PigCalculatorApp:
-    def __init__(self):
-        self.pig_db = PigDatabase()
+    def __init__(self, storage=None):
+        self.pig_db = PigDatabase(storage)
         self.root = Tk()
         self.root.title("Pig Breeding Calculator")
-        self.feed_data = [
-            (1, 28, "breastfeeding", 0.21),
-            (29, 42, "0.00075kg of feed 2", 0.4),
-            (43, 56, "1kg of feed 2", 1.0),
-            (57, 70, "0.255kg of feed 2", 0.655),
-            (71, 85, "1.4kg of feed 3", 0.71),
-            (86, 99, "0.805kg of feed 3", 0.805),
-            (100, 114, "0.970kg of feed 3", 0.97),
-            (115, 128, "1.020kg of feed 3", 1.02),
-            (129, 143, "1.120kg of feed 4", 1.12),
-            (144, 157, "1.100kg of feed 4", 1.1),
-            (158, 240, "2.5kg of feed 4", "")
-        ]
+        self.feed_data = FEED_DATA
         self.selected_batch = StringVar(self.root)  # Make it an instance variable
         self.selected_batch.set(self.pig_db.get_pig_batches()[0])
         self.create_widgets()
@@ -120,7 +102,7 @@ class PigCalculatorApp:
 
         actual_weight = simpledialog.askfloat("Input", "Enter the actual weight of the pig:")
 
-        health_status = "Excellent" if actual_weight >= expected_weight else "Critical" if actual_weight < (expected_weight - 10) else "Average"
+        health_status = classify_health(actual_weight, expected_weight)
 
         return {
             "expected_weight": round(expected_weight, 3),
@@ -130,13 +112,12 @@ class PigCalculatorApp:
         }
 
     def determine_feed_for_age(self, age_in_days):
-        for start_day, end_day, feed_description, _ in self.feed_data:
-            if start_day <= age_in_days <= end_day:
-                if isinstance(_, float):
-                    return feed_description
-                else:
-                    return round(random.uniform(1.5, 2.5), 3)
-        return None
+        band = find_feed_band(age_in_days, self.feed_data)
+        if band is None:
+            return None
+        if isinstance(band[3], float):
+            return band[2]
+        return round(random.uniform(1.5, 2.5), 3)
 
     def display_result_in_window(self, result):
         result_window = Tk()
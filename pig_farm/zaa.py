@@ -6,20 +6,23 @@ from plyer import notification
 import sqlite3
 import threading
 from ttkthemes import ThemedStyle
-
-# Constants
-DEFAULT_GESTATION_PERIOD = 144  # Default gestation period in days
+from change_events import change_notifier
+from farm_logging import setup_logging, log_operation
+from farm_rules import DEFAULT_GESTATION_PERIOD
+from farm_schema import create_breeding_table
+from herd_model import CHUNK_SIZE, iter_chunks
+from storage import BREEDING_DATABASE, resolve_storage
 
 # Setup logging
-logging.basicConfig(filename='pig_breeding.log', level=logging.ERROR)
+setup_logging()
 
 class PigBreedingApp:
-    def __init__(self, window):
+    def __init__(self, window, storage=None):
         self.window = window
         self.window.title("Pig Breeding Calculator")
 
         # Initialize database connection
-        self.conn, self.cursor = self.initialize_database()
+        self.conn, self.cursor = self.initialize_database(storage)
 
         # Set the theme
         style = ThemedStyle(self.window)
@@ -59,21 +62,19 @@ class PigBreedingApp:
         # Enable view database button after successful database initialization
         view_database_button["state"] = "normal"
 
-    def initialize_database(self):
+        # Row ids shown per pig while the entries list is shown, None otherwise
+        self.displayed_entries = None
+        change_notifier.subscribe("pig_breeding", self.on_breeding_changed)
+        self.window.bind("<Destroy>", self.on_window_destroyed, add="+")
+
+    def initialize_database(self, storage=None):
         try:
             # Create a SQLite database connection
-            conn = sqlite3.connect('pig_breeding.db')
+            conn = resolve_storage(storage, BREEDING_DATABASE).connect()
             cursor = conn.cursor()
 
             # Create a table to store pig breeding data if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS pig_breeding (
-                    id INTEGER PRIMARY KEY,
-                    pig_id TEXT,
-                    served_date DATE,
-                    expected_birth_date DATE
-                )
-            ''')
+            create_breeding_table(cursor)
             conn.commit()
 
             return conn, cursor
@@ -94,9 +95,10 @@ class PigBreedingApp:
 
     def insert_data_into_database(self, pig_id, served_date, expected_birth_date):
         try:
-            self.cursor.execute("INSERT INTO pig_breeding (pig_id, served_date, expected_birth_date) VALUES (?, ?, ?)",
-                               (pig_id, served_date, expected_birth_date))
-            self.conn.commit()
+            with log_operation("insert_breeding_record"):
+                self.cursor.execute("INSERT INTO pig_breeding (pig_id, served_date, expected_birth_date) VALUES (?, ?, ?)",
+                                   (pig_id, served_date, expected_birth_date))
+                self.conn.commit()
             return True
 
         except Exception as e:
@@ -117,11 +119,12 @@ class PigBreedingApp:
 
     def delete_pig_from_database(self, pig_id):
         try:
-            self.cursor.execute("DELETE FROM pig_breeding WHERE pig_id=?", (pig_id,))
-            self.conn.commit()
+            with log_operation("delete_pig_from_database"):
+                self.cursor.execute("DELETE FROM pig_breeding WHERE pig_id=?", (pig_id,))
+                self.conn.commit()
 
-            # Refresh the displayed entries after successful deletion
-            self.view_database_entries()
+            # Let the displayed entries drop the deleted pig without re-querying
+            change_notifier.publish("pig_breeding", "delete", pig_id)
 
             return True
 
@@ -132,12 +135,6 @@ class PigBreedingApp:
 
     def view_database_entries(self):
         try:
-            self.cursor.execute("SELECT * FROM pig_breeding")
-            entries = self.cursor.fetchall()
-
-            # Sort entries based on days left
-            entries.sort(key=lambda entry: (datetime.strptime(entry[3], '%Y-%m-%d').date() - datetime.now().date()).days)
-
             # Clear existing text in the widget
             self.result_text_widget.delete(1.0, "end")
 
@@ -145,21 +142,21 @@ class PigBreedingApp:
             header_text = "ID\tPig ID\tServed Date\tExpected Birth Date\tDays Left\n"
             self.result_text_widget.insert("end", header_text)
 
-            if entries:
+            self.displayed_entries = {}
+            for entries in self.iter_database_entries():
                 for entry in entries:
                     # Extracting relevant information
-                    if len(entry) >= 4:
-                        pig_id, served_date, expected_birth_date = entry[1:4]
-
-                        # Calculate and print the number of days left
-                        days_left = (datetime.strptime(expected_birth_date, '%Y-%m-%d').date() - datetime.now().date()).days
+                    if len(entry) >= 5:
+                        pig_id, served_date, expected_birth_date, days_left = entry[1:5]
 
-                        # Format the entry text
+                        # Format the entry text, tagged by row id (pig IDs are free text) so deletions can remove just these lines
                         entry_text = f"{entry[0]}\t{pig_id}\t{served_date}\t{expected_birth_date}\t{days_left}\n"
-                        self.result_text_widget.insert("end", entry_text)
+                        self.result_text_widget.insert("end", entry_text, f"entry-{entry[0]}")
+                        self.displayed_entries.setdefault(pig_id, []).append(entry[0])
                     else:
                         logging.warning("Invalid entry format in the database.")
-            else:
+
+            if not self.displayed_entries:
                 # Display a message if there are no entries
                 self.result_text_widget.insert("end", "No entries in the database.")
 
@@ -167,6 +164,29 @@ class PigBreedingApp:
             logging.error(f"An error occurred while fetching database entries: {e}")
             messagebox.showerror("Error", "An unexpected error occurred. Please check the logs.")
 
+    def on_breeding_changed(self, action, pig_id, changes):
+        # Only patch when the widget is showing the entries list
+        if action != "delete" or self.displayed_entries is None or pig_id not in self.displayed_entries:
+            return
+
+        for entry_id in self.displayed_entries.pop(pig_id):
+            self.result_text_widget.delete(f"entry-{entry_id}.first", f"entry-{entry_id}.last")
+
+        if not self.displayed_entries:
+            self.result_text_widget.insert("end", "No entries in the database.")
+
+    def on_window_destroyed(self, event):
+        if event.widget is self.window:
+            change_notifier.unsubscribe("pig_breeding", self.on_breeding_changed)
+
+    def iter_database_entries(self, chunk_size=CHUNK_SIZE, cancel_event=None):
+        # Sorted by expected birth date (i.e. days left) and streamed in chunks
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, pig_id, served_date, expected_birth_date, "
+                       "CAST(julianday(expected_birth_date) - julianday(?) AS INTEGER) AS days_left "
+                       "FROM pig_breeding ORDER BY expected_birth_date", (str(datetime.now().date()),))
+        return iter_chunks(cursor, chunk_size, cancel_event)
+
     def calculate_and_display(self):
         try:
             pig_id = self.pig_id_entry.get().strip()
@@ -221,6 +241,7 @@ class PigBreedingApp:
                 threading.Timer(86400, self.show_notification, args=[notification_message]).start()  # Schedule notification after 24 hours
 
         # Clear existing text in the widget and insert new results
+        self.displayed_entries = None
         self.result_text_widget.delete(1.0, "end")
         self.result_text_widget.insert("end", result_text)
 